@@ -0,0 +1,412 @@
+"""
+Measures how the phases of a regulation scale with the size of the problem
+
+Each instance of a ladder of synthetic problems is converted, built,
+solved and converted back. The wall time and the peak memory of each
+phase are written to a json results file, which can be compared to a
+baseline results file to flag regressions. The solve is compared on the
+deterministic time of CP-SAT, its wall time being too noisy. The problems
+of a corpus directory written by CpAgent.save_instance can be measured
+instead.
+
+Usage
+-----
+python benchmarks/scaling.py --output results.json
+python benchmarks/scaling.py --baseline baseline.json
+python benchmarks/scaling.py --corpus instances/
+"""
+
+import argparse
+import json
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from pyosrd.schedules import Schedule
+
+from cpagent.cp_agent import CpAgent
+from cpagent.instances import Instance, InstanceCorpus
+from cpagent.schedule_adapters import (
+    steps_from_schedule,
+    step_table_from_schedule,
+    schedule_from_solution,
+    OptimisationStatus,
+)
+
+
+# (nb_zones, nb_trains) of the instances of each ladder
+LADDERS = {
+    "small": [(10, 5), (20, 10)],
+    "default": [(10, 5), (20, 10), (40, 20), (80, 40)],
+    "large": [
+        (10, 5), (20, 10), (40, 20), (80, 40), (160, 80), (320, 160),
+        (640, 320), (1280, 640),
+    ],
+}
+
+PHASES = (
+    "steps_from_schedule",
+    "step_table_from_schedule",
+    "build_model",
+    "solve_from_steps",
+    "schedule_from_solution",
+)
+
+
+def synthetic_instance(
+    nb_zones: int,
+    nb_trains: int,
+    seed: int = 0,
+    delay: int = 60,
+    fixed_ratio: float = 0.
+) -> tuple[Schedule, Schedule, pd.DataFrame]:
+    """Generate trains running over sections of a line of zones
+
+    Each train runs over 2 to 5 consecutive zones, the first train
+    being delayed.
+
+    Parameters
+    ----------
+    nb_zones : int
+        number of zones of the line
+    nb_trains : int
+        number of trains
+    seed : int, optional
+        seed of the generator, by default 0
+    delay : int, optional
+        delay of the first train, by default 60
+    fixed_ratio : float, optional
+        probability of a step to have a fixed duration, by default 0
+
+    Returns
+    -------
+    tuple[Schedule, Schedule, pd.DataFrame]
+        the reference and delayed schedules and the fixed durations
+    """
+    rng = np.random.default_rng(seed)
+    ref_schedule = Schedule(nb_zones, nb_trains)
+    delayed_schedule = Schedule(nb_zones, nb_trains)
+    for train in range(nb_trains):
+        length = int(rng.integers(2, min(nb_zones, 5), endpoint=True))
+        start = int(rng.integers(0, nb_zones - length, endpoint=True))
+        t = train * 15 + int(rng.integers(0, 10))
+        train_delay = delay if train == 0 else 0
+        for zone in range(start, start + length):
+            duration = int(rng.integers(5, 20))
+            ref_schedule.set(train, zone, (t, t + duration))
+            delayed_schedule.set(
+                train, zone, (t + train_delay, t + duration + train_delay))
+            t += duration - int(rng.integers(0, 2))
+    fixed_durations = pd.DataFrame(
+        rng.random((nb_zones, nb_trains)) < fixed_ratio, range(nb_zones))
+    return ref_schedule, delayed_schedule, fixed_durations
+
+
+def _peak_rss() -> int:
+    """Peak resident memory of the process in kB (Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _run_phases(
+    instance: tuple[Schedule, Schedule, pd.DataFrame],
+    time_limit: float,
+    phase_hook
+) -> dict:
+    """Run the phases of a regulation, calling phase_hook(name, func)
+    to run each phase
+
+    Returns
+    -------
+    dict
+        the size and the solve statistics of the instance and the
+        deterministic time of the solve
+    """
+    ref_schedule, delayed_schedule, fixed_durations = instance
+
+    phase_hook("steps_from_schedule", lambda: steps_from_schedule(
+        ref_schedule, delayed_schedule, fixed_durations))
+    steps = phase_hook(
+        "step_table_from_schedule", lambda: step_table_from_schedule(
+            ref_schedule, delayed_schedule, fixed_durations))
+
+    nb_zones = len(ref_schedule.zones)
+    nb_trains = len(ref_schedule.trains)
+    build_agent = CpAgent("benchmark")
+    build_agent.nb_zones = nb_zones
+    build_agent.nb_trains = nb_trains
+    build_agent.steps = steps
+    phase_hook("build_model", build_agent._build_model)
+
+    agent = CpAgent("benchmark")
+    agent.max_optimization_time = time_limit
+    solver, cp_status = phase_hook(
+        "solve_from_steps",
+        lambda: agent._solve_from_steps(nb_zones, nb_trains, steps))
+    status = agent.status_map[cp_status]
+    if status == OptimisationStatus.FAILED:
+        t_in, t_out = steps.min_t_in, steps.min_t_out
+    else:
+        t_in = solver.Values(agent.t_in).to_numpy()
+        t_out = solver.Values(agent.t_out).to_numpy()
+    phase_hook("schedule_from_solution", lambda: schedule_from_solution(
+        ref_schedule, status, steps, t_in, t_out))
+
+    return {
+        "nb_steps": len(steps),
+        "nb_precedences": len(agent.precs),
+        "status": status.name,
+        "objective": (
+            None if status == OptimisationStatus.FAILED
+            else solver.ObjectiveValue()),
+        "deterministic_time": solver.ResponseProto().deterministic_time,
+    }
+
+
+def benchmark_instance(
+    nb_zones: int,
+    nb_trains: int,
+    repeat: int = 3,
+    time_limit: float = 10,
+    seed: int = 0
+) -> dict:
+    """Measure the phases of the regulation of a synthetic instance
+
+    The wall time of a phase is the median of repeat runs, its memory is
+    the peak of the python allocations traced by tracemalloc during a
+    separate run, as tracing slows down the phases. The solve also
+    records the median deterministic time of CP-SAT.
+
+    Returns
+    -------
+    dict
+        the size, the solve statistics and the measures of each phase
+    """
+    instance = synthetic_instance(nb_zones, nb_trains, seed)
+    wall = {phase: [] for phase in PHASES}
+
+    def timed(name, func):
+        start = time.perf_counter()
+        result = func()
+        wall[name].append(time.perf_counter() - start)
+        return result
+
+    deterministic_times = []
+    for _ in range(repeat):
+        stats = _run_phases(instance, time_limit, timed)
+        deterministic_times.append(stats.pop("deterministic_time"))
+
+    memory = {}
+
+    def traced(name, func):
+        tracemalloc.start()
+        try:
+            return func()
+        finally:
+            memory[name] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    _run_phases(instance, time_limit, traced)
+
+    results = {
+        "nb_zones": nb_zones,
+        "nb_trains": nb_trains,
+        **stats,
+        "phases": {
+            phase: {
+                "wall_time": statistics.median(wall[phase]),
+                "peak_memory": memory[phase],
+            }
+            for phase in PHASES
+        },
+        "peak_rss_kb": _peak_rss(),
+    }
+    results["phases"]["solve_from_steps"]["deterministic_time"] = (
+        statistics.median(deterministic_times))
+    return results
+
+
+def benchmark_corpus_instance(
+    instance: Instance,
+    repeat: int = 3,
+    time_limit: float = 10
+) -> dict:
+    """Measure the build and the solve of a problem of a corpus, with the
+    settings it was saved with
+
+    Returns
+    -------
+    dict
+        the size, the solve statistics and the measures of each phase
+    """
+    wall = {"build_model": [], "solve_from_steps": []}
+    deterministic_times = []
+    memory = {}
+    for run in range(repeat + 1):
+        # the last run is traced
+        traced = run == repeat
+        agent = CpAgent("benchmark")
+        for name, value in instance.settings.items():
+            setattr(agent, name, value)
+        agent.max_optimization_time = time_limit
+        agent.nb_zones, agent.nb_trains, agent.steps = instance.problem
+        for phase, func in (
+            ("build_model", agent._build_model),
+            ("solve_from_steps",
+             lambda: agent._solve_from_steps(*instance.problem)),
+        ):
+            if traced:
+                tracemalloc.start()
+                func()
+                memory[phase] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            else:
+                start = time.perf_counter()
+                result = func()
+                wall[phase].append(time.perf_counter() - start)
+                if phase == "solve_from_steps":
+                    deterministic_times.append(
+                        result[0].ResponseProto().deterministic_time)
+
+    results = {
+        "name": instance.name,
+        "nb_zones": instance.nb_zones,
+        "nb_trains": instance.nb_trains,
+        "nb_steps": len(instance.steps),
+        "nb_precedences": len(agent.precs),
+        "status": agent.status.name,
+        "objective": agent.solve_report["solver"]["objective"],
+        "phases": {
+            phase: {
+                "wall_time": statistics.median(wall[phase]),
+                "peak_memory": memory[phase],
+            }
+            for phase in wall
+        },
+        "peak_rss_kb": _peak_rss(),
+    }
+    results["phases"]["solve_from_steps"]["deterministic_time"] = (
+        statistics.median(deterministic_times))
+    return results
+
+
+def _instance_key(instance: dict) -> tuple:
+    """Key matching an instance of results with the one of a baseline"""
+    return instance.get("name"), instance["nb_zones"], instance["nb_trains"]
+
+
+def compare(
+    results: dict,
+    baseline: dict,
+    tolerance: float = .25,
+    min_time: float = .1,
+    min_memory: int = 1 << 20
+) -> list[str]:
+    """List the phases of results slower or bigger than in baseline
+
+    A phase regresses if its measure exceeds the baseline by more than
+    tolerance (relative) and by more than min_time or min_memory
+    (absolute), small measures being too noisy to compare. A phase
+    measured in deterministic time in both results is compared on it
+    rather than on its wall time.
+
+    Returns
+    -------
+    list[str]
+        a description of each regression
+    """
+    baseline_instances = {
+        _instance_key(instance): instance
+        for instance in baseline["instances"]
+    }
+    regressions = []
+    for instance in results["instances"]:
+        key = _instance_key(instance)
+        if key not in baseline_instances:
+            continue
+        size = key[1:]
+        for phase, measures in instance["phases"].items():
+            reference = baseline_instances[key]["phases"].get(phase)
+            if reference is None:
+                continue
+            time_measure = (
+                "deterministic_time"
+                if "deterministic_time" in measures
+                and "deterministic_time" in reference
+                else "wall_time"
+            )
+            for measure, threshold in (
+                (time_measure, min_time), ("peak_memory", min_memory)
+            ):
+                value, base = measures[measure], reference[measure]
+                if (
+                    value > base * (1 + tolerance)
+                    and value - base > threshold
+                ):
+                    regressions.append(
+                        (f"{key[0]}: " if key[0] is not None else "")
+                        + f"{size[0]} zones x {size[1]} trains, {phase}: "
+                        f"{measure} {value:.4g} vs {base:.4g}"
+                    )
+    return regressions
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ladder", choices=LADDERS, default="default")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--time-limit", type=float, default=10)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline")
+    parser.add_argument(
+        "--corpus", help="directory of problems to measure instead")
+    parser.add_argument("--tolerance", type=float, default=.25)
+    args = parser.parse_args(argv)
+
+    results = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "time_limit": args.time_limit,
+        "instances": [],
+    }
+    if args.corpus is not None:
+        instances = (
+            benchmark_corpus_instance(instance, args.repeat, args.time_limit)
+            for instance in InstanceCorpus(args.corpus)
+        )
+    else:
+        instances = (
+            benchmark_instance(
+                nb_zones, nb_trains, args.repeat, args.time_limit)
+            for nb_zones, nb_trains in LADDERS[args.ladder]
+        )
+    for instance in instances:
+        results["instances"].append(instance)
+        print(
+            (f"{instance['name']}: " if "name" in instance else "")
+            + f"{instance['nb_zones']} zones x {instance['nb_trains']} trains "
+            f"({instance['nb_steps']} steps, {instance['status']}): "
+            + ", ".join(
+                f"{phase} {measures['wall_time']:.3f}s"
+                for phase, measures in instance["phases"].items()
+            )
+        )
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline, encoding="utf-8") as file:
+        regressions = compare(results, json.load(file), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -44,6 +44,7 @@ setuptools.setup(
     setup_requires=["wheel"],
     install_requires=[
         'ortools',
+        'numpy',
         'pyosrd @ git+ssh://git@github.com/y-plus/pyosrd.git',
         'importlib-resources'
         ],
@@ -0,0 +1,80 @@
+"""
+Provides the regulation of schedules from an asyncio event loop
+"""
+
+import asyncio
+import os
+import weakref
+
+import pandas as pd
+from pyosrd.schedules import Schedule
+
+
+# interval between two stop requests to a cancelled solve, the search
+# can only be stopped once the model is built
+STOP_POLL_INTERVAL = .05
+
+
+async def solve_async(
+    self,
+    ref_schedule: Schedule = None,
+    delayed_schedule: Schedule = None,
+    fixed_durations: pd.DataFrame = None,
+    weights: pd.DataFrame = None
+) -> Schedule:
+    """Regulate a delayed schedule in a thread, without blocking the
+    event loop
+
+    Each request is solved by a copy of the agent, whose state is not
+    modified. At most max_concurrent_solves requests are solved at the
+    same time in each event loop, the others wait for their turn. If the
+    request is cancelled, the solve is stopped (see stop_search) and the
+    cancellation is raised once the thread is done.
+
+    Parameters
+    ----------
+    ref_schedule : Schedule, optional
+        the reference schedule, the one of the agent by default
+    delayed_schedule : Schedule, optional
+        the delayed schedule, the one of the agent by default
+    fixed_durations : pd.DataFrame, optional
+        steps that are fixed, the ones of the agent by default
+    weights : pd.DataFrame, optional
+        weight for each step, the ones of the agent by default
+
+    Returns
+    -------
+    Schedule
+        the regulated schedule
+    """
+    if ref_schedule is None:
+        ref_schedule = self.ref_schedule
+    if delayed_schedule is None:
+        delayed_schedule = self.delayed_schedule
+    if fixed_durations is None:
+        fixed_durations = self.step_has_fixed_duration
+    if weights is None:
+        weights = self.weights
+    # a semaphore is bound to the event loop it is first used in
+    if self.solve_semaphores is None:
+        self.solve_semaphores = weakref.WeakKeyDictionary()
+    loop = asyncio.get_running_loop()
+    limit = self.max_concurrent_solves or os.cpu_count() or 1
+    if self.solve_semaphores.get(loop, (None,))[0] != limit:
+        # the requests waiting for the previous limit keep it
+        self.solve_semaphores[loop] = (limit, asyncio.Semaphore(limit))
+    _, semaphore = self.solve_semaphores[loop]
+
+    agent = self._sub_agent(rolling_horizon=self.rolling_horizon)
+    async with semaphore:
+        future = loop.run_in_executor(
+            None, agent._solve, ref_schedule, delayed_schedule,
+            fixed_durations, weights)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # keep the slot until the thread is done
+            while not future.done():
+                agent.stop_search()
+                await asyncio.wait({future}, timeout=STOP_POLL_INTERVAL)
+            raise
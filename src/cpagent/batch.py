@@ -0,0 +1,166 @@
+"""
+Provides the regulation of a reference schedule under many delay scenarios
+"""
+
+import os
+from collections import deque
+from collections.abc import Iterable, Iterator, Mapping
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from pyosrd.schedules import Schedule
+
+from cpagent.parallel import solve_steps, _worker_parameters
+from cpagent.schedule_adapters import (
+    _schedule_layout,
+    step_table_from_schedule,
+    schedule_from_solution,
+    OptimisationStatus
+)
+
+
+@dataclass
+class ScenarioResult:
+    """
+    Result of the regulation of one delay scenario
+    """
+    # key of the scenario, its position if the scenarios are not a mapping
+    key: object
+    status: OptimisationStatus
+    # None if the solve failed
+    objective: float = None
+    t_in: np.ndarray = None
+    t_out: np.ndarray = None
+    # only built if requested
+    schedule: Schedule = None
+    # exception raised by the solve of the scenario, if any
+    error: BaseException = None
+    # history of the solve exported with the key, if save_history is set
+    history: dict = None
+
+
+def regulate_batch(
+    self,
+    delayed_schedules: Mapping | Iterable[Schedule],
+    ref_schedule: Schedule = None,
+    fixed_durations: pd.DataFrame = None,
+    weights: pd.DataFrame = None,
+    materialize: bool = False,
+    max_pending: int = None
+) -> Iterator[ScenarioResult]:
+    """Regulate a reference schedule under many delay scenarios
+
+    The layout of the reference schedule is computed once and shared by
+    all the scenarios. The scenarios are solved in a pool of max_workers
+    processes with at most max_pending scenarios submitted at a time, so
+    that a large or lazy collection of scenarios is consumed as the
+    results come back. The cores are shared between the workers unless
+    solver_parameters sets num_workers. The results are yielded in
+    completion order, a scenario whose conversion or solve raises gets a
+    FAILED result holding the exception. If the consumer stops early, the
+    solves already running are not waited for.
+
+    Parameters
+    ----------
+    delayed_schedules : Mapping | Iterable[Schedule]
+        the delayed schedules, either by scenario key or as an iterable
+        (the keys being then their positions)
+    ref_schedule : Schedule, optional
+        the reference schedule, the one of the agent by default
+    fixed_durations : pd.DataFrame, optional
+        steps that are fixed, the ones of the agent by default
+    weights : pd.DataFrame, optional
+        weight for each step, the ones of the agent by default
+    materialize : bool, optional
+        build the regulated Schedule of each scenario, by default False
+    max_pending : int, optional
+        maximum number of scenarios submitted to the pool,
+        twice the number of workers by default
+
+    Yields
+    ------
+    ScenarioResult
+        the result of each scenario
+    """
+    if ref_schedule is None:
+        ref_schedule = self.ref_schedule
+    if fixed_durations is None:
+        fixed_durations = self.step_has_fixed_duration
+    if weights is None:
+        weights = self.weights
+
+    layout = _schedule_layout(ref_schedule)
+    nb_zones = len(ref_schedule.zones)
+    nb_trains = len(ref_schedule.trains)
+    max_workers = self.max_workers or os.cpu_count() or 1
+    settings = dict(
+        self._solver_settings(),
+        solver_parameters=_worker_parameters(
+            self.solver_parameters, max_workers)
+    )
+    if max_pending is None:
+        max_pending = 2 * max_workers
+
+    scenarios = iter(
+        delayed_schedules.items()
+        if isinstance(delayed_schedules, Mapping)
+        else enumerate(delayed_schedules)
+    )
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    pending = {}
+    failed = deque()
+
+    def submit():
+        for key, delayed_schedule in scenarios:
+            try:
+                steps = step_table_from_schedule(
+                    ref_schedule, delayed_schedule, fixed_durations, weights,
+                    layout)
+                future = executor.submit(
+                    solve_steps, settings, nb_zones, nb_trains, steps)
+            except Exception as error:
+                # a malformed scenario fails alone, the next one is taken
+                failed.append(ScenarioResult(
+                    key, OptimisationStatus.FAILED, error=error))
+                continue
+            pending[future] = (key, steps)
+            return
+
+    try:
+        for _ in range(max_pending):
+            submit()
+        while pending or failed:
+            while failed:
+                yield failed.popleft()
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, steps = pending.pop(future)
+                submit()
+                error = future.exception()
+                if error is not None:
+                    yield ScenarioResult(
+                        key, OptimisationStatus.FAILED, error=error)
+                    continue
+                status, t_in, t_out, objective, history = future.result()
+                if history is not None:
+                    history["instance_id"] = key
+                yield ScenarioResult(
+                    key,
+                    status,
+                    objective,
+                    t_in,
+                    t_out,
+                    schedule_from_solution(
+                        ref_schedule, status, steps, t_in, t_out)
+                    if materialize else None,
+                    history=history
+                )
+    finally:
+        # the consumer may stop early, the remaining scenarios are dropped
+        # and the solves already running are not waited for, their
+        # workers exit once they are done
+        executor.shutdown(wait=not pending, cancel_futures=True)
@@ -1,3 +1,5 @@
+import numpy as np
+
 from ortools.sat.python import cp_model
 
 
@@ -13,9 +15,19 @@ def _create_constraints(
     """
     self._add_spacing_constraints(model)
     self._add_chaining_constraints(model)
+    self._add_last_step_constraints(model)
     if not self.allow_change_order:
         self._add_enforce_order_constraints(model)
-    self._add_precedence_constraints(model)
+    if self.sequencing == "precedence" and self.lean_model:
+        self._add_lean_precedence_constraints(model)
+    elif self.sequencing == "precedence":
+        self._add_precedence_constraints(model)
+    elif self.sequencing == "circuit":
+        self._add_circuit_constraints(model)
+    else:
+        raise ValueError(
+            f"unknown sequencing {self.sequencing!r}, "
+            "expected 'precedence' or 'circuit'")
 
 
 def _add_spacing_constraints(
@@ -28,11 +40,10 @@ def _add_spacing_constraints(
     model : cp_model.CpModel
         model to fill
     """
-    for zone_idx in range(self.nb_zones):
+    for steps_of_zone in self.steps_per_zone.values():
         model.AddNoOverlap([
             self.intervals[i]
-            for i, step in enumerate(self.steps)
-            if step['zone'] == zone_idx
+            for i in steps_of_zone.tolist()
         ])
 
 
@@ -47,25 +58,72 @@ def _add_chaining_constraints(
     model : cp_model.CpModel
         model to fill
     """
-    for i, step in enumerate(self.steps):
-        if step['prev'] != -1:
-            model.Add(
-                self.t_in[i] == self.t_out[step['prev']]
-                - step['overlap']
+    self.chaining_constraints = {}
+    for i, (prev, overlap) in enumerate(zip(
+            self.steps.prev.tolist(), self.steps.overlap.tolist())):
+        if prev != -1:
+            self.chaining_constraints[i] = model.Add(
+                self.t_in[i] == self.t_out[prev]
+                - overlap
             )
 
 
+def _add_last_step_constraints(
+        self,
+        model: cp_model.CpModel) -> None:
+    """Ensures that the last step of each train leaves its zone as
+    soon as possible
+
+    Nothing follows the last step of a train, leaving later can only
+    delay the next trains of its zone, so its departure time is fixed by
+    its arrival time and the solutions of the same cost do not differ by
+    it.
+
+    Parameters
+    ----------
+    model : cp_model.CpModel
+        model to fill
+    """
+    _, _, t_out_lb, _, duration_lb, _ = (
+        bound.tolist() for bound in self.domains)
+    # the next links are optional, the last steps are the ones that are
+    # not the previous step of another one
+    is_last = np.ones(len(self.steps), dtype=bool)
+    is_last[self.steps.prev[self.steps.prev >= 0]] = False
+    self.last_step_constraints = {}
+    for i in np.flatnonzero(is_last).tolist():
+        self.last_step_constraints[i] = model.AddMaxEquality(
+            self.t_out[i],
+            [self.t_in[i] + duration_lb[i], t_out_lb[i]]
+        )
+
+
 def _add_enforce_order_constraints(
         self,
         model: cp_model.CpModel
 ) -> None:
-    for i, step in enumerate(self.steps):
-        for j, other in enumerate(self.steps):
-            if (
-                step['min_t_in'] < other['min_t_in']
-                and step['zone'] == other['zone']
-            ):
-                model.Add(self.t_in[i] < self.t_in[j])
+    """Ensures that the trains enter each zone in the order of
+    their min arrival times
+
+    Steps with the same min arrival time are not ordered. The order
+    being transitive, only the steps of consecutive min arrival times
+    in a zone are constrained.
+
+    Parameters
+    ----------
+    model : cp_model.CpModel
+        model to fill
+    """
+    min_t_in = self.steps.min_t_in
+    for steps_of_zone in self.steps_per_zone.values():
+        ordered = steps_of_zone[
+            np.argsort(min_t_in[steps_of_zone], kind="stable")]
+        levels = np.split(
+            ordered, np.flatnonzero(np.diff(min_t_in[ordered])) + 1)
+        for before, after in zip(levels[:-1], levels[1:]):
+            for i in before.tolist():
+                for j in after.tolist():
+                    model.Add(self.t_in[i] < self.t_in[j])
 
 
 def _add_precedence_constraints(
@@ -83,38 +141,83 @@ def _add_precedence_constraints(
     model : cp_model.CpModel
         model to fill
     """
-    # build a map of step per zone
-    step_per_zone = {}
-    for step in self.steps:
-        if not step['zone'] in step_per_zone:
-            step_per_zone[step['zone']] = []
-        step_per_zone[step['zone']].append(step)
+    zones = self.steps.zone.tolist()
+    zone_positions = self.zone_positions.tolist()
+    steps_per_zone = {
+        zone: steps_of_zone.tolist()
+        for zone, steps_of_zone in self.steps_per_zone.items()
+    }
 
     # Constraints 8 and 9 from the model
-    for steps_of_zone in step_per_zone.values():
-        model.AddExactlyOne(self.firsts[step['idx']] for step in steps_of_zone)
-        model.AddExactlyOne(self.lasts[step['idx']] for step in steps_of_zone)
+    for steps_of_zone in steps_per_zone.values():
+        model.AddExactlyOne(self.firsts[i] for i in steps_of_zone)
+        model.AddExactlyOne(self.lasts[i] for i in steps_of_zone)
 
-    for i, step in enumerate(self.steps):
+    # only the steps sharing the zone of a step can precede or follow it
+    for i, zone in enumerate(zones):
         all_others_before = [self.lasts[i]]
         all_others_after = [self.firsts[i]]
-        for j, other in enumerate(self.steps):
-            if (
-                step['train'] != other['train']
-                and step['zone'] == other['zone']
-            ):
-                all_others_before.append(self.precs[i][j])
-                all_others_after.append(self.precs[j][i])
+        diff_itineraries = self.diff_itineraries[zone][
+            zone_positions[i]].tolist()
+        for j in steps_per_zone[zone]:
+            if (i, j) in self.precs:
+                all_others_before.append(self.precs[i, j])
+                all_others_after.append(self.precs[j, i])
                 # Constraint 10
-                model.AddAtMostOne([self.precs[i][j], self.precs[j][i]])
+                model.AddAtMostOne([self.precs[i, j], self.precs[j, i]])
                 # Constraint 11
                 model.Add(
                     self.t_out[i]
-                    + self.itinierary_setup * self.diff_itineraries[i][j]
+                    + self.itinierary_setup
+                    * diff_itineraries[zone_positions[j]]
                     <= self.t_in[j]) \
-                    .OnlyEnforceIf(self.precs[i][j])
+                    .OnlyEnforceIf(self.precs[i, j])
 
         # Constraint 12
         model.AddExactlyOne(all_others_before)
         # Constraint 13
         model.AddExactlyOne(all_others_after)
+
+
+def _add_circuit_constraints(
+        self,
+        model: cp_model.CpModel
+) -> None:
+    """Ensure that the precedence between trains is well respected
+    with one circuit constraint per zone.
+
+    The nodes of the circuit of a zone are a depot and the steps of the
+    zone. The arcs from and to the depot are the first and last
+    variables of the steps, the arcs between steps are their precedence
+    variables. This replaces constraints 8, 9, 10, 12 and 13 in the
+    model, the itinerary setup (constraint 11) is enforced on the arcs.
+
+    Parameters
+    ----------
+    model : cp_model.CpModel
+        model to fill
+    """
+    zone_positions = self.zone_positions.tolist()
+
+    for zone, steps_of_zone in self.steps_per_zone.items():
+        steps_of_zone = steps_of_zone.tolist()
+        diff_itineraries = self.diff_itineraries[zone].tolist()
+        # node 0 is the depot, the step at position p is the node p + 1
+        arcs = []
+        for i in steps_of_zone:
+            node_i = zone_positions[i] + 1
+            arcs.append((0, node_i, self.firsts[i]))
+            arcs.append((node_i, 0, self.lasts[i]))
+            for j in steps_of_zone:
+                if (i, j) in self.precs:
+                    arcs.append(
+                        (node_i, zone_positions[j] + 1, self.precs[i, j]))
+                    # Constraint 11
+                    model.Add(
+                        self.t_out[i]
+                        + self.itinierary_setup
+                        * diff_itineraries[zone_positions[i]][
+                            zone_positions[j]]
+                        <= self.t_in[j]) \
+                        .OnlyEnforceIf(self.precs[i, j])
+        model.AddCircuit(arcs)
@@ -19,19 +19,73 @@ class CpAgent(SchedulerAgent):
     A regulation agent using a constraint programming solver
     """
 
+    from .lean import (
+        _create_lean_variables,
+        _add_lean_precedence_constraints,
+        _create_lean_objective
+    )
     from .constraints import (
         _add_spacing_constraints,
         _add_chaining_constraints,
+        _add_last_step_constraints,
         _add_enforce_order_constraints,
         _add_precedence_constraints,
+        _add_circuit_constraints,
         _create_constraints  # must be last because it calls above methods
     )
-    from .variables import _create_variables
-    from .objectives import _create_objective
+    from .variables import (
+        _compute_diff_itineraries,
+        _create_variables,
+        _step_domains,
+        _tighten_domains,
+        _update_domains
+    )
+    from .objectives import (
+        _create_objective,
+        _objective_value
+    )
+    from .hints import (
+        _hint_times,
+        _add_hints
+    )
+    from .incremental import (
+        _structure_key,
+        _update_model
+    )
     from .solver import (
         _solve_from_steps,
+        _build_model,
+        _apply_solver_parameters,
         _get_solution,
-        _solve
+        _schedule_from_times,
+        _sub_agent,
+        _solve,
+        stop_search,
+        _stop_requested
+    )
+    from .rolling_horizon import _solve_rolling_horizon
+    from .decomposition import _solve_components
+    from .parallel import (
+        _solver_settings,
+        _solve_portfolio
+    )
+    from .greedy import (
+        _greedy_solution,
+        _solve_greedy
+    )
+    from .batch import regulate_batch
+    from .asynchronous import solve_async
+    from .streaming import solve_stream
+    from .prepared import prepare_timetable
+    from .instances import (
+        save_instance,
+        load_instance
+    )
+    from .report import (
+        _start_report,
+        _phase,
+        _report_model,
+        _report_solver
     )
 
     t_in = None
@@ -43,7 +97,75 @@ class CpAgent(SchedulerAgent):
     extra_delays = None
     max_optimization_time = SOLVER_TIMEOUT
     save_history = False
+    # maximum number of solutions kept in history, the oldest are dropped
+    history_capacity = 1024
+    # called with an ImprovingSolution for each solution of the cp solves,
+    # from the thread of the solve
+    solution_callback = None
     itinierary_setup = 120
+    # "precedence" or "circuit" formulation of the order of the trains
+    # in each zone
+    sequencing = "precedence"
+    # bound the times of the steps with the greedy heuristic and
+    # propagate the bounds along the trains
+    tight_domains = False
+    # build the model from numpy arrays with boolean literals, the
+    # variables being only named if variable_names is True
+    lean_model = False
+    variable_names = True
+    # "cp" or "greedy"
+    engine = "cp"
+    # use the greedy heuristic if the cp solve fails
+    greedy_fallback = False
+    # None, "delayed", "previous" or "greedy"
+    hint_mode = None
+    repair_hint = False
+    last_solution = None
+    # keep the model between solves and only update the changed bounds
+    incremental = False
+    # steps of the last solution started before current_time are frozen
+    current_time = None
+    model = None
+    model_key = None
+    model_overlap = None
+    # (indices, t_in, t_out) of steps whose times are fixed
+    fixed_times = None
+    # solve the problem by overlapping time windows
+    rolling_horizon = False
+    window_length = 3600
+    window_overlap = 600
+    window_time_limit = None
+    rolling_horizon_compare = False
+    rolling_horizon_report = None
+    # solve independent groups of trains in a pool of processes
+    decompose = False
+    max_workers = None
+    # stop the search when the objective is within these gaps of
+    # the best bound. With decompose, rolling_horizon or
+    # parameter_portfolio they apply to each sub solve separately,
+    # the greedy engine and fallback ignore them
+    relative_gap_limit = None
+    absolute_gap_limit = None
+    # SatParameters fields set on the solver, e.g. {"num_workers": 8}
+    solver_parameters = None
+    # parameter sets raced in separate processes
+    parameter_portfolio = None
+    portfolio_winner = None
+    # time of each phase, model size and solver statistics of the last solve
+    solve_report = None
+    # OptimisationStatus and relative gap to the best bound of the last
+    # solve, the gap being None unless it was a plain cp solve
+    status = None
+    gap = None
+    # cp solver of the solve in progress, see stop_search
+    running_solver = None
+    # stop requests of the solve in progress, shared with the copies of
+    # the agent solving its sub problems
+    search_stop = None
+    # solve_async requests solved at the same time, cpu count by default
+    max_concurrent_solves = None
+    # (max_concurrent_solves, semaphore) of each running event loop
+    solve_semaphores = None
 
     # solution
 
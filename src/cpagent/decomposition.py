@@ -0,0 +1,133 @@
+"""
+Provides the decomposition of a regulation problem in independent
+sub problems
+"""
+
+import multiprocessing
+import os
+
+import numpy as np
+
+from cpagent.asynchronous import STOP_POLL_INTERVAL
+from cpagent.history import SolveHistory
+from cpagent.parallel import solve_steps, _worker_parameters
+from cpagent.schedule_adapters import OptimisationStatus
+from cpagent.step_table import StepTable
+
+
+def conflict_components(steps: StepTable) -> list[np.ndarray]:
+    """Compute the connected components of the train-zone conflict graph,
+    two trains being connected if they share a zone
+
+    Parameters
+    ----------
+    steps : StepTable
+        the steps of the problem
+
+    Returns
+    -------
+    list[np.ndarray]
+        the sorted indices of the steps of each component
+    """
+    parents = list(range(len(steps.train_labels)))
+
+    def find(train):
+        while parents[train] != train:
+            parents[train] = parents[parents[train]]
+            train = parents[train]
+        return train
+
+    for steps_of_zone in steps.steps_per_zone().values():
+        trains = np.unique(steps.train[steps_of_zone]).tolist()
+        root = find(trains[0])
+        for train in trains[1:]:
+            parents[find(train)] = root
+
+    roots = np.array([find(train) for train in steps.train.tolist()])
+    return [
+        np.flatnonzero(roots == root)
+        for root in dict.fromkeys(roots.tolist())
+    ]
+
+
+def _solve_components(
+    self,
+    nb_zones: int,
+    nb_trains: int,
+    steps: StepTable
+) -> tuple[OptimisationStatus, np.ndarray, np.ndarray]:
+    """Solve each independent component of a regulation problem as
+    its own cp model, in a pool of max_workers processes
+
+    The cores are shared between the processes solving at the same time
+    unless solver_parameters sets num_workers. The pool is terminated if
+    the solve is stopped by stop_search, the decomposition then fails.
+    With save_history, the history of a problem with a single component
+    is kept, the histories of several components are not recorded.
+
+    Parameters
+    ----------
+    nb_zones : int
+        number of zones
+    nb_trains : int
+        number of trains
+    steps : StepTable
+        the steps of the problem
+
+    Returns
+    -------
+    tuple[OptimisationStatus, np.ndarray, np.ndarray]
+        the worst status of the components and the merged t_in and t_out
+        of the steps
+    """
+    self.nb_zones = nb_zones
+    self.nb_trains = nb_trains
+    self.steps = steps
+
+    components = conflict_components(steps)
+    settings = self._solver_settings()
+    self.history = SolveHistory(self.history_capacity)
+    if len(components) <= 1:
+        # solved in this process, the search can be stopped as the one
+        # of a copy of the agent
+        results = [solve_steps(
+            dict(settings, search_stop=self.search_stop),
+            nb_zones, nb_trains, steps)]
+        if results[0][4] is not None:
+            self.history.merge(results[0][4])
+    else:
+        # the objectives of the components are not the one of the
+        # problem, their histories are not recorded
+        nb_processes = min(
+            self.max_workers or os.cpu_count() or 1, len(components))
+        settings = dict(
+            settings,
+            save_history=False,
+            solver_parameters=_worker_parameters(
+                self.solver_parameters, nb_processes)
+        )
+        # the pool is terminated when leaving the block
+        with multiprocessing.Pool(self.max_workers) as pool:
+            pending = pool.starmap_async(solve_steps, [
+                (settings, nb_zones, nb_trains, steps.subset(component))
+                for component in components
+            ])
+            while not pending.ready():
+                if self._stop_requested():
+                    return OptimisationStatus.FAILED, None, None
+                pending.wait(STOP_POLL_INTERVAL)
+            results = pending.get()
+
+    t_in = steps.min_t_in.copy()
+    t_out = steps.min_t_out.copy()
+    status = OptimisationStatus.OPTIMAL
+    for component, (component_status, component_t_in,
+                    component_t_out, _, _) in zip(components, results):
+        if component_status == OptimisationStatus.FAILED:
+            return OptimisationStatus.FAILED, None, None
+        if component_status == OptimisationStatus.SUBOPTIMAL:
+            status = OptimisationStatus.SUBOPTIMAL
+        t_in[component] = component_t_in
+        t_out[component] = component_t_out
+
+    return status, t_in, t_out
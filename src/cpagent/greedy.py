@@ -0,0 +1,406 @@
+"""
+Provides a greedy heuristic regulating the trains one after the other
+"""
+
+from bisect import bisect_right
+
+import numpy as np
+
+from cpagent.schedule_adapters import OptimisationStatus
+from cpagent.step_table import StepTable
+
+
+# propagation iterations spent on the fixed order solution when it is
+# only a candidate, it usually converges in a few iterations
+FIXED_ORDER_CANDIDATE_ITERATIONS = 100
+
+
+class _ZoneOccupation:
+    """
+    Sorted, non overlapping occupation intervals of a zone
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.steps = []
+
+    def insert(self, start: int, end: int, step: int) -> None:
+        position = bisect_right(self.starts, start)
+        self.starts.insert(position, start)
+        self.ends.insert(position, end)
+        self.steps.insert(position, step)
+
+    def remove(self, step: int) -> None:
+        position = self.steps.index(step)
+        del self.starts[position], self.ends[position], self.steps[position]
+
+
+def greedy_times(
+    steps: StepTable,
+    domains: tuple[np.ndarray, ...],
+    itinierary_setup: int = 0,
+    allow_change_order: bool = True
+) -> tuple[np.ndarray, np.ndarray] | None:
+    """Regulate the trains one after the other
+
+    The trains are inserted in the order of their first arrival time,
+    the trains having steps with frozen times first. Each step of a
+    train is placed at the earliest time its zone is free, taking the
+    itinerary setup into account. When a step has to arrive later than
+    the departure of its previous step, the previous step has to leave
+    later, which is propagated backward along the train until a step
+    that can wait longer in its zone.
+
+    The earliest times keeping in each zone the order of the min arrival
+    times are also computed, the best of both solutions respecting the
+    constraints of the cp model is returned. A train visiting a zone
+    twice may not be placed validly, its solution is then discarded.
+
+    Parameters
+    ----------
+    steps : StepTable
+        the steps of the problem
+    domains : tuple[np.ndarray, ...]
+        lower and upper bounds of t_in, t_out and durations of the steps,
+        as computed by _step_domains
+    itinierary_setup : int, optional
+        setup time between two trains with different itineraries,
+        by default 0
+    allow_change_order : bool, optional
+        if False, the trains keep in each zone the order of their min
+        arrival times and the earliest times respecting these orders are
+        computed instead, by default True
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray] | None
+        the t_in and t_out of the steps, None if no solution respecting
+        the constraints was found
+    """
+    def valid(times):
+        return times is not None and _respects_constraints(
+            steps, domains, itinierary_setup, allow_change_order, *times)
+
+    if not allow_change_order:
+        fixed_order = _fixed_order_times(steps, domains, itinierary_setup)
+        return fixed_order if valid(fixed_order) else None
+    fixed_order = _fixed_order_times(
+        steps, domains, itinierary_setup, FIXED_ORDER_CANDIDATE_ITERATIONS)
+    if not valid(fixed_order):
+        fixed_order = None
+
+    t_in_lb, t_in_ub, t_out_lb, t_out_ub, duration_lb, duration_ub = (
+        bound.tolist() for bound in domains)
+    nb_steps = len(steps)
+    zones = steps.zone.tolist()
+    overlaps = steps.overlap.tolist()
+    next_zones = np.where(
+        steps.next >= 0, steps.zone[steps.next], -1).tolist()
+
+    has_prev = steps.prev >= 0
+    if np.bincount(steps.prev[has_prev], minlength=1).max() > 1:
+        # a step followed by several steps can not be a train path
+        return fixed_order
+    successors = np.full(nb_steps, -1, dtype=np.int64)
+    successors[steps.prev[has_prev]] = np.flatnonzero(has_prev)
+    successors = successors.tolist()
+    frozen = (
+        (domains[0] == domains[1]) | (domains[2] == domains[3])).tolist()
+
+    trains = []
+    for first in np.flatnonzero(~has_prev).tolist():
+        chain = [first]
+        while successors[chain[-1]] >= 0:
+            chain.append(successors[chain[-1]])
+        trains.append(chain)
+    trains.sort(key=lambda chain: (
+        not any(frozen[i] for i in chain), t_in_lb[chain[0]]))
+
+    occupations = {}
+    t_in = np.zeros(nb_steps, dtype=np.int64)
+    t_out = np.zeros(nb_steps, dtype=np.int64)
+
+    def margin(i, j):
+        if next_zones[i] < 0 or next_zones[j] < 0:
+            return 0
+        return itinierary_setup if next_zones[i] != next_zones[j] else 0
+
+    def earliest_slot(i, arrival, min_departure):
+        """Earliest arrival and departure of the step i in its zone"""
+        occupation = occupations.setdefault(zones[i], _ZoneOccupation())
+        while True:
+            departure = max(min_departure, arrival + duration_lb[i])
+            # occupations ending before arrival - setup can not conflict
+            position = bisect_right(
+                occupation.ends, arrival - itinierary_setup)
+            conflict_end = None
+            while (
+                position < len(occupation.starts)
+                and occupation.starts[position] - itinierary_setup
+                < departure
+            ):
+                j = occupation.steps[position]
+                setup = margin(i, j)
+                if not (
+                    departure + setup <= occupation.starts[position]
+                    or arrival >= occupation.ends[position] + setup
+                ):
+                    conflict_end = occupation.ends[position] + setup
+                    break
+                position += 1
+            if conflict_end is None:
+                break
+            arrival = conflict_end
+        return arrival, departure
+
+    for chain in trains:
+        arrival_lb = [t_in_lb[i] for i in chain]
+        departure_lb = [t_out_lb[i] for i in chain]
+        arrivals = [0] * len(chain)
+        departures = [0] * len(chain)
+        k = 0
+        while k < len(chain):
+            i = chain[k]
+            arrival = max(arrival_lb[k], departure_lb[k] - duration_ub[i])
+            if k > 0:
+                arrival = max(arrival, departures[k - 1] - overlaps[i])
+            slot = earliest_slot(i, arrival, departure_lb[k])
+            if slot[0] > t_in_ub[i] or slot[1] > t_out_ub[i]:
+                return fixed_order
+            arrival_lb[k] = arrivals[k] = slot[0]
+            departures[k] = slot[1]
+            if k > 0 and arrivals[k] > departures[k - 1] - overlaps[i]:
+                # the previous step has to leave later
+                departure_lb[k - 1] = arrivals[k] + overlaps[i]
+                k -= 1
+                occupations[zones[chain[k]]].remove(chain[k])
+                continue
+            # the step is inserted at once so that the next steps of the
+            # train can not overlap it when they revisit its zone
+            occupations[zones[i]].insert(slot[0], slot[1], i)
+            k += 1
+
+        t_in[chain] = arrivals
+        t_out[chain] = departures
+
+    if not valid((t_in, t_out)) or (
+        fixed_order is not None
+        and _weighted_delay(steps, fixed_order[0])
+        <= _weighted_delay(steps, t_in)
+    ):
+        return fixed_order
+    return t_in, t_out
+
+
+def _weighted_delay(steps: StepTable, t_in: np.ndarray) -> int:
+    """Objective value of the arrival times of the steps"""
+    return int(((t_in - steps.min_t_in) * steps.ponderation).sum())
+
+
+def _respects_constraints(
+    steps: StepTable,
+    domains: tuple[np.ndarray, ...],
+    itinierary_setup: int,
+    allow_change_order: bool,
+    t_in: np.ndarray,
+    t_out: np.ndarray
+) -> bool:
+    """Check that times of the steps are a solution of the cp model
+
+    The steps of each zone are taken in the order of their times, two
+    consecutive steps must be of different trains and separated by the
+    itinerary setup. Steps of a zone with the same times are taken in
+    the order of their indices, which may reject a valid solution.
+
+    Parameters
+    ----------
+    steps : StepTable
+        the steps of the problem
+    domains : tuple[np.ndarray, ...]
+        lower and upper bounds of t_in, t_out and durations of the steps
+    itinierary_setup : int
+        setup time between two trains with different itineraries
+    allow_change_order : bool
+        if False, the trains must enter each zone in the order of their
+        min arrival times
+    t_in : np.ndarray
+        arrival times of the steps
+    t_out : np.ndarray
+        departure times of the steps
+
+    Returns
+    -------
+    bool
+        True if the times respect all the constraints
+    """
+    t_in_lb, t_in_ub, t_out_lb, t_out_ub, duration_lb, duration_ub = domains
+    durations = t_out - t_in
+    if (
+        (t_in < t_in_lb).any() or (t_in > t_in_ub).any()
+        or (t_out < t_out_lb).any() or (t_out > t_out_ub).any()
+        or (durations < duration_lb).any() or (durations > duration_ub).any()
+    ):
+        return False
+
+    has_prev = np.flatnonzero(steps.prev >= 0)
+    prevs = steps.prev[has_prev]
+    if (t_in[has_prev] != t_out[prevs] - steps.overlap[has_prev]).any():
+        return False
+
+    next_zones = np.where(steps.next >= 0, steps.zone[steps.next], -1)
+    for steps_of_zone in steps.steps_per_zone().values():
+        ordered = steps_of_zone[np.lexsort(
+            (steps_of_zone, t_out[steps_of_zone], t_in[steps_of_zone]))]
+        before, after = ordered[:-1], ordered[1:]
+        setups = itinierary_setup * (
+            (next_zones[before] >= 0)
+            & (next_zones[after] >= 0)
+            & (next_zones[before] != next_zones[after])
+        )
+        if (
+            (t_out[before] + setups > t_in[after]).any()
+            or (steps.train[before] == steps.train[after]).any()
+        ):
+            return False
+        if not allow_change_order:
+            min_t_in = steps.min_t_in[steps_of_zone]
+            later = min_t_in[:, None] < min_t_in[None, :]
+            arrivals = t_in[steps_of_zone]
+            if (later & (arrivals[:, None] >= arrivals[None, :])).any():
+                return False
+    return True
+
+
+def _fixed_order_times(
+    steps: StepTable,
+    domains: tuple[np.ndarray, ...],
+    itinierary_setup: int = 0,
+    max_iterations: int = None
+) -> tuple[np.ndarray, np.ndarray] | None:
+    """Compute the earliest times of the steps when the trains pass in
+    each zone in the order of their min arrival times
+
+    The order being known, the constraints are differences between the
+    times of the steps, whose least solution is computed by propagating
+    the lower bounds until a fixed point. Steps with the same min arrival
+    time are ordered by index.
+
+    Parameters
+    ----------
+    steps : StepTable
+        the steps of the problem
+    domains : tuple[np.ndarray, ...]
+        lower and upper bounds of t_in, t_out and durations of the steps
+    itinierary_setup : int, optional
+        setup time between two trains with different itineraries,
+        by default 0
+    max_iterations : int, optional
+        maximum number of propagation iterations, by default enough
+        to prove that the constraints have no solution
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray] | None
+        the t_in and t_out of the steps, None if the bounds can not
+        be respected or no fixed point was reached
+    """
+    t_in_lb, t_in_ub, t_out_lb, t_out_ub, duration_lb, duration_ub = domains
+    next_zones = np.where(steps.next >= 0, steps.zone[steps.next], -1)
+
+    before, after = [], []
+    for steps_of_zone in steps.steps_per_zone().values():
+        ordered = steps_of_zone[
+            np.argsort(steps.min_t_in[steps_of_zone], kind="stable")]
+        before.append(ordered[:-1])
+        after.append(ordered[1:])
+    before = np.concatenate(before or [np.zeros(0, dtype=np.int64)])
+    after = np.concatenate(after or [np.zeros(0, dtype=np.int64)])
+    setups = itinierary_setup * (
+        (next_zones[before] >= 0)
+        & (next_zones[after] >= 0)
+        & (next_zones[before] != next_zones[after])
+    )
+    # enforce order constraints are strict between different min times
+    strict = (steps.min_t_in[before] < steps.min_t_in[after]).astype(np.int64)
+
+    has_prev = np.flatnonzero(steps.prev >= 0)
+    prevs = steps.prev[has_prev]
+    overlaps = steps.overlap[has_prev]
+
+    t_in = t_in_lb.copy()
+    t_out = np.maximum(t_out_lb, t_in + duration_lb)
+    # a fixed point is reached in at most one iteration per time variable
+    # unless the constraints have no solution
+    if max_iterations is None:
+        max_iterations = 2 * len(steps) + 1
+    for _ in range(max_iterations):
+        new_t_in = t_in.copy()
+        np.maximum.at(new_t_in, after, t_out[before] + setups)
+        np.maximum.at(new_t_in, after, t_in[before] + strict)
+        new_t_in[has_prev] = np.maximum(
+            new_t_in[has_prev], t_out[prevs] - overlaps)
+        new_t_out = np.maximum(t_out, new_t_in + duration_lb)
+        np.maximum.at(new_t_out, prevs, new_t_in[has_prev] + overlaps)
+        new_t_in = np.maximum(new_t_in, new_t_out - duration_ub)
+        if (
+            np.array_equal(new_t_in, t_in)
+            and np.array_equal(new_t_out, t_out)
+        ):
+            break
+        t_in, t_out = new_t_in, new_t_out
+    else:
+        return None
+
+    if (t_in > t_in_ub).any() or (t_out > t_out_ub).any():
+        return None
+    return t_in, t_out
+
+
+def _greedy_solution(self) -> tuple[np.ndarray, np.ndarray] | None:
+    """Regulate the current steps with the greedy heuristic
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray] | None
+        the t_in and t_out of the steps, None if the heuristic failed
+    """
+    return greedy_times(
+        self.steps,
+        self._step_domains(tighten=False),
+        self.itinierary_setup,
+        self.allow_change_order
+    )
+
+
+def _solve_greedy(
+    self,
+    nb_zones: int,
+    nb_trains: int,
+    steps: StepTable
+) -> tuple[OptimisationStatus, np.ndarray, np.ndarray]:
+    """Solve a regulation problem with the greedy heuristic
+
+    Parameters
+    ----------
+    nb_zones : int
+        number of zones
+    nb_trains : int
+        number of trains
+    steps : StepTable
+        the steps of the problem
+
+    Returns
+    -------
+    tuple[OptimisationStatus, np.ndarray, np.ndarray]
+        HEURISTIC and the t_in and t_out of the steps, or FAILED
+    """
+    self.nb_zones = nb_zones
+    self.nb_trains = nb_trains
+    self.steps = steps
+
+    times = self._greedy_solution()
+    if times is None:
+        return OptimisationStatus.FAILED, None, None
+    self.last_solution = times
+    return (OptimisationStatus.HEURISTIC, *times)
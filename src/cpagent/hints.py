@@ -0,0 +1,78 @@
+import numpy as np
+
+from ortools.sat.python import cp_model
+
+
+def _hint_times(self) -> tuple[np.ndarray, np.ndarray]:
+    """Select the arrival and departure times used as solution hint
+
+    With hint_mode "previous" or in incremental mode, the last solution
+    found by the agent is used if it has as many steps as the current
+    problem. With hint_mode "greedy", the solution of the greedy
+    heuristic is used if it succeeds. Otherwise the min times of the
+    steps (i.e. the delayed schedule) are used. An unknown hint_mode
+    raises a ValueError.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        the hinted t_in and t_out of each step
+    """
+    if self.hint_mode not in (None, "delayed", "previous", "greedy"):
+        raise ValueError(
+            f"unknown hint_mode {self.hint_mode!r}, "
+            "expected 'delayed', 'previous' or 'greedy'")
+    if (
+        (self.hint_mode == "previous" or self.incremental)
+        and self.last_solution is not None
+        and len(self.last_solution[0]) == len(self.steps)
+    ):
+        return self.last_solution
+    if self.hint_mode == "greedy":
+        times = self._greedy_solution()
+        if times is not None:
+            return times
+    return self.steps.min_t_in, self.steps.min_t_out
+
+
+def _add_hints(
+    self,
+    model: cp_model.CpModel
+) -> None:
+    """Add a solution hint to the model
+
+    The times of the steps are hinted and the precedence variables are
+    hinted from the order of the hinted arrival times in each zone.
+
+    Parameters
+    ----------
+    model : cp_model.CpModel
+        model to fill
+    """
+    t_in, t_out = self._hint_times()
+    t_in = np.asarray(t_in, dtype=np.int64)
+    t_out = np.asarray(t_out, dtype=np.int64)
+
+    for var, value in zip(self.t_in, t_in.tolist()):
+        model.AddHint(var, value)
+    for var, value in zip(self.t_out, t_out.tolist()):
+        model.AddHint(var, value)
+    for var, value in zip(self.durations, (t_out - t_in).tolist()):
+        model.AddHint(var, value)
+
+    is_first = np.zeros(len(self.steps), dtype=bool)
+    is_last = np.zeros(len(self.steps), dtype=bool)
+    consecutive = set()
+    for steps_of_zone in self.steps_per_zone.values():
+        ordered = steps_of_zone[
+            np.argsort(t_in[steps_of_zone], kind="stable")].tolist()
+        is_first[ordered[0]] = True
+        is_last[ordered[-1]] = True
+        consecutive.update(zip(ordered[:-1], ordered[1:]))
+
+    for var, value in zip(self.firsts, is_first.tolist()):
+        model.AddHint(var, value)
+    for var, value in zip(self.lasts, is_last.tolist()):
+        model.AddHint(var, value)
+    for pair, var in self.precs.items():
+        model.AddHint(var, pair in consecutive)
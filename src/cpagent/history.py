@@ -0,0 +1,113 @@
+"""
+Provides a bounded record of the solutions found during a solve
+"""
+
+from collections.abc import Iterator
+
+import numpy as np
+
+
+class SolveHistory:
+    """
+    Ring buffer of the (user time, objective, best bound) of the solutions
+    found during a solve
+
+    The buffer is allocated at the first record. Once it is full, each
+    record overwrites the oldest one, the number of overwritten records
+    being counted in dropped. Iterating over the history gives the
+    records as tuples, oldest first, as the list it replaces.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        """
+        Parameters
+        ----------
+        capacity : int, optional
+            maximum number of records kept, by default 1024
+        """
+        if capacity < 1:
+            raise ValueError("the capacity of the history must be positive")
+        self.capacity = capacity
+        self.buffer = None
+        # number of records since the start of the solve
+        self.count = 0
+
+    @property
+    def dropped(self) -> int:
+        """Number of records overwritten by more recent ones"""
+        return max(0, self.count - self.capacity)
+
+    def record(
+        self,
+        user_time: float,
+        objective: float,
+        best_bound: float
+    ) -> None:
+        """Record a solution, overwriting the oldest record if full"""
+        if self.buffer is None:
+            self.buffer = np.empty((self.capacity, 3))
+        self.buffer[self.count % self.capacity] = (
+            user_time, objective, best_bound)
+        self.count += 1
+
+    def merge(self, exported: dict) -> None:
+        """Record the records of an exported history, oldest first
+
+        Parameters
+        ----------
+        exported : dict
+            a history exported by export, e.g. by another process
+        """
+        for record in zip(
+            exported["user_time"].tolist(),
+            exported["objective"].tolist(),
+            exported["best_bound"].tolist()
+        ):
+            self.record(*record)
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def to_array(self) -> np.ndarray:
+        """Copy the records, oldest first
+
+        Returns
+        -------
+        np.ndarray
+            an array of shape (len(history), 3) of the user times,
+            objectives and best bounds
+        """
+        if self.buffer is None:
+            return np.empty((0, 3))
+        if self.count <= self.capacity:
+            return self.buffer[:self.count].copy()
+        return np.roll(self.buffer, -(self.count % self.capacity), axis=0)
+
+    def __getitem__(self, i: int) -> tuple[float, float, float]:
+        return tuple(self.to_array()[i].tolist())
+
+    def __iter__(self) -> Iterator[tuple[float, float, float]]:
+        return iter(map(tuple, self.to_array().tolist()))
+
+    def export(self, instance_id=None) -> dict:
+        """Export the records with the identifier of the solved problem
+
+        Parameters
+        ----------
+        instance_id : optional
+            identifier of the problem, by default None
+
+        Returns
+        -------
+        dict
+            the instance_id, the user_time, objective and best_bound
+            arrays of the records and the number of dropped records
+        """
+        records = self.to_array()
+        return {
+            "instance_id": instance_id,
+            "user_time": records[:, 0],
+            "objective": records[:, 1],
+            "best_bound": records[:, 2],
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,80 @@
+"""
+Provides the incremental update of a cp model between two regulations
+of problems with the same structure
+"""
+
+import hashlib
+
+import numpy as np
+
+from ortools.sat.python import cp_model
+
+
+def _structure_key(self) -> tuple:
+    """Compute a key identifying the structure of the cp model of the
+    current steps, two problems with the same key only differ by the
+    bounds of their steps, their overlaps and their ponderations
+
+    Returns
+    -------
+    tuple
+        the key of the structure
+    """
+    steps = self.steps
+    columns = [steps.train, steps.zone, steps.prev, steps.next]
+    if not self.allow_change_order:
+        # order constraints depend on the relative order of the steps
+        columns.append(np.unique(steps.min_t_in, return_inverse=True)[1])
+    digest = hashlib.sha1()
+    for column in columns:
+        digest.update(np.ascontiguousarray(column, dtype=np.int64).tobytes())
+    return (
+        self.nb_zones,
+        len(steps),
+        self.allow_change_order,
+        self.itinierary_setup,
+        self.sequencing,
+        digest.hexdigest()
+    )
+
+
+def _update_model(
+    self,
+    model: cp_model.CpModel,
+    previous_overlap: np.ndarray
+) -> None:
+    """Update a model built for a problem with the same structure
+    to the current steps
+
+    Only the domains of the steps whose bounds changed and the chaining
+    constraints whose overlap changed are rewritten, the bounds of the
+    departures of the last steps are rewritten, the objective is rebuilt
+    and the hints are cleared.
+
+    Parameters
+    ----------
+    model : cp_model.CpModel
+        the model to update
+    previous_overlap : np.ndarray
+        overlaps of the steps the model was built or updated for
+    """
+    self._update_domains(model)
+
+    proto = model.Proto()
+    changed = np.flatnonzero(self.steps.overlap != previous_overlap)
+    for i in changed.tolist():
+        linear = proto.constraints[self.chaining_constraints[i].Index()].linear
+        # t_in[i] - t_out[prev] == -overlap, up to the sign of the terms
+        sign = linear.coeffs[list(linear.vars).index(self.t_in[i].Index())]
+        linear.domain.clear()
+        linear.domain.extend([-sign * int(self.steps.overlap[i])] * 2)
+
+    _, _, t_out_lb, _, duration_lb, _ = self.domains
+    for i, constraint in self.last_step_constraints.items():
+        # t_out[i] == max(t_in[i] + duration_lb, t_out_lb)
+        for expression in proto.constraints[constraint.Index()].lin_max.exprs:
+            expression.offset = int(
+                duration_lb[i] if expression.vars else t_out_lb[i])
+
+    self._create_objective(model)
+    model.ClearHints()
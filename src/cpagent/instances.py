@@ -0,0 +1,229 @@
+"""
+Provides an on-disk format for the regulation problems and a corpus of
+memory-mapped problems
+
+A problem named name is stored as name.npy, the steps as a numpy
+structured array, and name.json, the number of zones and trains, the
+train labels, the solver settings and free metadata. The sidecar is
+written last, a problem is complete once its sidecar exists.
+"""
+
+import json
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from cpagent.step_table import StepTable
+
+
+# version of the on-disk format, stored in the sidecar
+INSTANCE_FORMAT = 1
+
+# fields of the steps and their types, the ponderation keeping its own
+STEP_FIELDS = (
+    ("idx", np.int32),
+    ("train", np.int32),
+    ("zone", np.int32),
+    ("prev", np.int32),
+    ("next", np.int32),
+    ("min_t_in", np.int64),
+    ("min_t_out", np.int64),
+    ("min_duration", np.int64),
+    ("is_fixed", np.bool_),
+    ("ponderation", None),
+    ("overlap", np.int64),
+)
+
+
+@dataclass
+class Instance:
+    """
+    A regulation problem read from disk
+    """
+    name: str
+    nb_zones: int
+    nb_trains: int
+    steps: StepTable
+    # attributes of the agent that solved the problem (see SOLVER_SETTINGS)
+    settings: dict = field(default_factory=dict)
+    metadata: dict = field(default_factory=dict)
+
+    @property
+    def problem(self) -> tuple[int, int, StepTable]:
+        """The arguments of _solve_from_steps"""
+        return self.nb_zones, self.nb_trains, self.steps
+
+
+def _instance_paths(path: str | Path) -> tuple[Path, Path]:
+    """Paths of the steps and of the sidecar of a problem, path being
+    given with or without extension"""
+    path = Path(path)
+    if path.suffix in (".npy", ".json"):
+        path = path.with_suffix("")
+    return (
+        path.with_name(path.name + ".npy"),
+        path.with_name(path.name + ".json")
+    )
+
+
+def write_instance(
+    path: str | Path,
+    nb_zones: int,
+    nb_trains: int,
+    steps: StepTable,
+    settings: dict = None,
+    metadata: dict = None
+) -> None:
+    """Write a regulation problem to disk
+
+    Parameters
+    ----------
+    path : str | Path
+        path of the problem, without extension
+    nb_zones : int
+        number of zones
+    nb_trains : int
+        number of trains
+    steps : StepTable
+        the steps of the problem
+    settings : dict, optional
+        the solver settings, by default none
+    metadata : dict, optional
+        json serializable metadata, by default none
+    """
+    steps_path, sidecar_path = _instance_paths(path)
+    table = np.empty(len(steps), dtype=[
+        (name, steps.ponderation.dtype if dtype is None else dtype)
+        for name, dtype in STEP_FIELDS
+    ])
+    for name, _ in STEP_FIELDS:
+        table[name] = getattr(steps, name)
+    np.save(steps_path, table, allow_pickle=False)
+
+    with open(sidecar_path, "w", encoding="utf-8") as file:
+        json.dump({
+            "format": INSTANCE_FORMAT,
+            "nb_zones": int(nb_zones),
+            "nb_trains": int(nb_trains),
+            # labels read from pandas indexes may be numpy scalars
+            "train_labels": [
+                label.item() if isinstance(label, np.generic) else label
+                for label in steps.train_labels
+            ],
+            "settings": settings or {},
+            "metadata": metadata or {},
+        }, file, indent=2)
+
+
+def read_instance(path: str | Path, mmap_mode: str = "r") -> Instance:
+    """Read a regulation problem from disk
+
+    Parameters
+    ----------
+    path : str | Path
+        path of the problem, with or without extension
+    mmap_mode : str, optional
+        memory-map mode of the steps (see numpy.load), None to read
+        them in memory, by default "r"
+
+    Returns
+    -------
+    Instance
+        the problem, its steps being views of the memory-mapped file
+    """
+    steps_path, sidecar_path = _instance_paths(path)
+    with open(sidecar_path, encoding="utf-8") as file:
+        sidecar = json.load(file)
+    if sidecar.get("format") != INSTANCE_FORMAT:
+        raise ValueError(
+            f"unsupported instance format {sidecar.get('format')!r} "
+            f"in {sidecar_path}")
+
+    table = np.load(steps_path, mmap_mode=mmap_mode, allow_pickle=False)
+    steps = StepTable(
+        **{name: table[name] for name, _ in STEP_FIELDS},
+        train_labels=sidecar["train_labels"]
+    )
+    return Instance(
+        steps_path.stem,
+        sidecar["nb_zones"],
+        sidecar["nb_trains"],
+        steps,
+        sidecar["settings"],
+        sidecar["metadata"]
+    )
+
+
+class InstanceCorpus:
+    """
+    A directory of regulation problems, read lazily and memory-mapped
+    """
+
+    def __init__(self, directory: str | Path, mmap_mode: str = "r"):
+        self.directory = Path(directory)
+        self.mmap_mode = mmap_mode
+        self.names = sorted(
+            path.stem for path in self.directory.glob("*.json"))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, key: int | str) -> Instance:
+        name = self.names[key] if isinstance(key, int) else key
+        return read_instance(self.directory / name, self.mmap_mode)
+
+    def __iter__(self) -> Iterator[Instance]:
+        for name in self.names:
+            yield self[name]
+
+
+def save_instance(self, path: str | Path, **metadata) -> None:
+    """Write the last problem solved by the agent and its solver settings
+    to disk, to reproduce its solve with load_instance
+
+    Parameters
+    ----------
+    path : str | Path
+        path of the problem, without extension
+    **metadata
+        json serializable metadata stored with the problem
+    """
+    if getattr(self, "steps", None) is None:
+        raise ValueError("the agent has not solved any problem")
+    write_instance(
+        path,
+        self.nb_zones,
+        self.nb_trains,
+        self.steps,
+        self._solver_settings(),
+        metadata
+    )
+
+
+def load_instance(
+    self,
+    path: str | Path,
+    apply_settings: bool = True
+) -> tuple[int, int, StepTable]:
+    """Read a problem written by save_instance
+
+    Parameters
+    ----------
+    path : str | Path
+        path of the problem, with or without extension
+    apply_settings : bool, optional
+        set the solver settings of the problem on the agent,
+        by default True
+
+    Returns
+    -------
+    tuple[int, int, StepTable]
+        the arguments of _solve_from_steps
+    """
+    instance = read_instance(path)
+    if apply_settings:
+        for name, value in instance.settings.items():
+            setattr(self, name, value)
+    return instance.problem
@@ -0,0 +1,170 @@
+"""
+Provides a lean build of the cp model, for large problems
+
+The variables and constraints are the ones of the default build, in
+the same order, but their indices and coefficients are computed with
+numpy, the precedence variables are boolean literals, the variables
+are only named if variable_names is True and the objective is built
+as a single weighted sum. Constraint 10 is only added once per pair of
+steps.
+"""
+
+import numpy as np
+
+from ortools.sat.python import cp_model
+
+
+def _create_lean_variables(
+        self,
+        model: cp_model.CpModel) -> None:
+    """Create the set of decision variables of a lean model
+
+    Parameters
+    ----------
+    model : cp_model.CpModel
+        The model to fill
+    """
+    steps = self.steps
+    nb_steps = len(steps)
+    names = self.variable_names
+    self.domains = self._step_domains()
+    t_in_lb, t_in_ub, t_out_lb, t_out_ub, duration_lb, duration_ub = (
+        bound.tolist() for bound in self.domains)
+
+    def int_vars(name, lower_bounds, upper_bounds):
+        return [
+            model.new_int_var(lower, upper, f"{name}[{i}]" if names else "")
+            for i, (lower, upper) in enumerate(zip(lower_bounds, upper_bounds))
+        ]
+
+    def bool_vars(name, nb_vars):
+        return [
+            model.new_bool_var(f"{name}[{i}]" if names else "")
+            for i in range(nb_vars)
+        ]
+
+    self.t_in = int_vars("t_in", t_in_lb, t_in_ub)
+    self.t_out = int_vars("t_out", t_out_lb, t_out_ub)
+    self.durations = int_vars("durations", duration_lb, duration_ub)
+    self.intervals = [
+        model.new_interval_var(
+            t_in, duration, t_out, f"intervals[{i}]" if names else "")
+        for i, (t_in, duration, t_out) in enumerate(
+            zip(self.t_in, self.durations, self.t_out))
+    ]
+    self.firsts = bool_vars("first", nb_steps)
+    self.lasts = bool_vars("last", nb_steps)
+
+    self._compute_diff_itineraries()
+    before, after = (pairs.tolist() for pairs in _precedence_pairs(self))
+    self.precs = dict(zip(zip(before, after), [
+        model.new_bool_var(f"prec_s{i}_s{j}" if names else "")
+        for i, j in zip(before, after)
+    ]))
+
+
+def _precedence_pairs(self) -> tuple[np.ndarray, np.ndarray]:
+    """Compute the pairs of steps of different trains sharing a zone
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        the first and second steps of the pairs, ordered by first step
+        then by second step
+    """
+    trains = self.steps.train
+    before = [np.zeros(0, dtype=np.int64)]
+    after = [np.zeros(0, dtype=np.int64)]
+    for steps_of_zone in self.steps_per_zone.values():
+        zone_before = np.repeat(steps_of_zone, len(steps_of_zone))
+        zone_after = np.tile(steps_of_zone, len(steps_of_zone))
+        different = trains[zone_before] != trains[zone_after]
+        before.append(zone_before[different])
+        after.append(zone_after[different])
+    before, after = np.concatenate(before), np.concatenate(after)
+    order = np.lexsort((after, before))
+    return before[order], after[order]
+
+
+def _add_lean_precedence_constraints(
+        self,
+        model: cp_model.CpModel
+) -> None:
+    """Add constraints 8 to 13 of the model to a lean model
+
+    Parameters
+    ----------
+    model : cp_model.CpModel
+        model to fill
+    """
+    steps = self.steps
+    nb_steps = len(steps)
+    # the precedence variables were created in the order of the pairs
+    before, after = _precedence_pairs(self)
+    precs = list(self.precs.values())
+    # position of the pair (j, i) of each pair (i, j), the keys being sorted
+    keys = before * nb_steps + after
+    reverse = np.searchsorted(keys, after * nb_steps + before)
+
+    next_zones = np.where(steps.next >= 0, steps.zone[steps.next], -1)
+    setups = self.itinierary_setup * (
+        (next_zones[before] >= 0)
+        & (next_zones[after] >= 0)
+        & (next_zones[before] != next_zones[after])
+    )
+    # the pairs are ordered by first step, the pairs of each second step
+    # are gathered in the order of their first step
+    before_ends = np.cumsum(np.bincount(before, minlength=nb_steps)).tolist()
+    after_order = np.argsort(after, kind="stable")
+    after_ends = np.cumsum(np.bincount(after, minlength=nb_steps)).tolist()
+
+    # Constraints 8 and 9 from the model
+    for steps_of_zone in self.steps_per_zone.values():
+        steps_of_zone = steps_of_zone.tolist()
+        model.add_exactly_one([self.firsts[i] for i in steps_of_zone])
+        model.add_exactly_one([self.lasts[i] for i in steps_of_zone])
+
+    # the arrays are converted step by step not to hold a python object
+    # per pair
+    start = after_start = 0
+    for i in range(nb_steps):
+        end, after_end = before_ends[i], after_ends[i]
+        for prec, j, setup, reverse_prec in zip(
+            precs[start:end],
+            after[start:end].tolist(),
+            setups[start:end].tolist(),
+            reverse[start:end].tolist()
+        ):
+            if i < j:
+                # Constraint 10
+                model.add_at_most_one(prec, precs[reverse_prec])
+            # Constraint 11
+            model.add(
+                self.t_out[i] + setup <= self.t_in[j]
+            ).only_enforce_if(prec)
+        # Constraint 12
+        model.add_exactly_one([self.lasts[i], *precs[start:end]])
+        # Constraint 13
+        model.add_exactly_one([
+            self.firsts[i],
+            *(precs[k] for k in after_order[after_start:after_end].tolist())
+        ])
+        start, after_start = end, after_end
+
+
+def _create_lean_objective(
+    self,
+    model: cp_model.CpModel
+) -> None:
+    """Add the objective function to a lean model
+
+    Parameters
+    ----------
+    model : cp_model.CpModel
+        model to fill
+    """
+    ponderation = self.steps.ponderation
+    model.minimize(
+        cp_model.LinearExpr.weighted_sum(self.t_in, ponderation.tolist())
+        - (self.steps.min_t_in * ponderation).sum().item()
+    )
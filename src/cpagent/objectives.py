@@ -1,3 +1,5 @@
+import numpy as np
+
 from ortools.sat.python import cp_model
 
 
@@ -12,8 +14,34 @@ def _create_objective(
     model : cp_model.CpModel
         model to fill
     """
+    if self.lean_model:
+        self._create_lean_objective(model)
+        return
     model.Minimize(sum([
-        (self.t_in[i] - step['min_t_in'])
-        * step['ponderation']
-        for i, step in enumerate(self.steps)
+        (self.t_in[i] - min_t_in)
+        * ponderation
+        for i, (min_t_in, ponderation) in enumerate(zip(
+            self.steps.min_t_in.tolist(),
+            self.steps.ponderation.tolist()))
     ]))
+
+
+def _objective_value(
+    self,
+    t_in: np.ndarray
+) -> float:
+    """Compute the objective value of a solution of the current steps
+
+    Parameters
+    ----------
+    t_in : np.ndarray
+        arrival time of each step
+
+    Returns
+    -------
+    float
+        the value of the objective function
+    """
+    return (
+        (np.asarray(t_in) - self.steps.min_t_in) * self.steps.ponderation
+    ).sum().item()
@@ -0,0 +1,257 @@
+"""
+Provides the solve of regulation problems in separate processes
+"""
+
+import multiprocessing
+import os
+import queue
+import time
+
+import numpy as np
+
+from google.protobuf import json_format
+from ortools.sat import sat_parameters_pb2
+
+from cpagent.asynchronous import STOP_POLL_INTERVAL
+from cpagent.history import SolveHistory
+from cpagent.schedule_adapters import OptimisationStatus
+from cpagent.step_table import StepTable
+
+
+# attributes of the agent forwarded to the agents solving in other processes
+SOLVER_SETTINGS = (
+    "allow_change_order",
+    "itinierary_setup",
+    "sequencing",
+    "tight_domains",
+    "lean_model",
+    "variable_names",
+    "max_optimization_time",
+    "hint_mode",
+    "repair_hint",
+    "relative_gap_limit",
+    "absolute_gap_limit",
+    "solver_parameters",
+    "save_history",
+    "history_capacity",
+)
+
+# extra time given to the portfolio processes to report their results
+PORTFOLIO_GRACE_PERIOD = 5
+
+
+def _solver_settings(self) -> dict:
+    """Get the settings of the agent needed to solve a problem
+    in another process
+
+    Returns
+    -------
+    dict
+        the value of each attribute of SOLVER_SETTINGS
+    """
+    return {name: getattr(self, name) for name in SOLVER_SETTINGS}
+
+
+def _time_limit(solver_parameters: dict, default: float) -> float:
+    """Get the time limit of a solve configured with solver_parameters
+
+    Parameters
+    ----------
+    solver_parameters : dict
+        SatParameters fields set on the solver (see solver_parameters)
+    default : float
+        the time limit if solver_parameters does not set one
+
+    Returns
+    -------
+    float
+        the max_time_in_seconds of solver_parameters, or default
+    """
+    parameters = json_format.ParseDict(
+        solver_parameters or {}, sat_parameters_pb2.SatParameters())
+    if parameters.HasField("max_time_in_seconds"):
+        return parameters.max_time_in_seconds
+    return default
+
+
+def _worker_parameters(
+    solver_parameters: dict,
+    nb_processes: int
+) -> dict:
+    """Get the parameters of a solve sharing the cores of the machine
+    with the solves of nb_processes - 1 other processes
+
+    Parameters
+    ----------
+    solver_parameters : dict
+        SatParameters fields set on the solver (see solver_parameters)
+    nb_processes : int
+        number of processes solving at the same time
+
+    Returns
+    -------
+    dict
+        solver_parameters, with num_workers set to the share of the cores
+        of each process unless it already sets it
+    """
+    parameters = json_format.ParseDict(
+        solver_parameters or {}, sat_parameters_pb2.SatParameters())
+    if parameters.HasField("num_workers"):
+        return solver_parameters
+    return {
+        **(solver_parameters or {}),
+        "num_workers": max(1, (os.cpu_count() or 1) // nb_processes),
+    }
+
+
+def solve_steps(
+    settings: dict,
+    nb_zones: int,
+    nb_trains: int,
+    steps: StepTable
+) -> tuple[OptimisationStatus, np.ndarray, np.ndarray, float, dict]:
+    """Solve a regulation problem with a new agent, to be run
+    in a process pool
+
+    Parameters
+    ----------
+    settings : dict
+        attributes to set on the agent
+    nb_zones : int
+        number of zones
+    nb_trains : int
+        number of trains
+    steps : StepTable
+        the steps of the problem
+
+    Returns
+    -------
+    tuple[OptimisationStatus, np.ndarray, np.ndarray, float, dict]
+        the status, the t_in and t_out of the steps (None if the solve
+        failed), the objective value and the exported history if
+        save_history is set
+    """
+    # imported here as the agent itself imports this module
+    from cpagent.cp_agent import CpAgent
+
+    agent = CpAgent("worker")
+    for name, value in settings.items():
+        setattr(agent, name, value)
+    solver, _ = agent._solve_from_steps(nb_zones, nb_trains, steps)
+    status = agent.status
+    history = agent.history.export() if agent.save_history else None
+    if status == OptimisationStatus.FAILED:
+        return status, None, None, None, history
+    return (
+        status,
+        solver.Values(agent.t_in).to_numpy(),
+        solver.Values(agent.t_out).to_numpy(),
+        solver.ObjectiveValue(),
+        history
+    )
+
+
+def _solve_portfolio(
+    self,
+    nb_zones: int,
+    nb_trains: int,
+    steps: StepTable
+) -> tuple[OptimisationStatus, np.ndarray, np.ndarray]:
+    """Race the parameter sets of parameter_portfolio in separate processes
+
+    Each parameter set is merged over solver_parameters, the cores being
+    shared between the processes unless it sets num_workers. The first
+    optimal solution is returned, or the best solution reported within
+    the time limit or before the solve is stopped by stop_search. The
+    index of the parameter set that produced the solution is stored in
+    portfolio_winner and its history in history if save_history is set.
+
+    Parameters
+    ----------
+    nb_zones : int
+        number of zones
+    nb_trains : int
+        number of trains
+    steps : StepTable
+        the steps of the problem
+
+    Returns
+    -------
+    tuple[OptimisationStatus, np.ndarray, np.ndarray]
+        the status and the t_in and t_out of the steps of the selected
+        solution
+    """
+    self.nb_zones = nb_zones
+    self.nb_trains = nb_trains
+    self.steps = steps
+    self.portfolio_winner = None
+    self.history = SolveHistory(self.history_capacity)
+
+    settings = self._solver_settings()
+    portfolio = [
+        _worker_parameters(
+            {**(self.solver_parameters or {}), **parameters},
+            len(self.parameter_portfolio))
+        for parameters in self.parameter_portfolio
+    ]
+    results = queue.Queue()
+    pool = multiprocessing.Pool(len(portfolio))
+    try:
+        for rank, parameters in enumerate(portfolio):
+            pool.apply_async(
+                solve_steps,
+                (
+                    dict(settings, solver_parameters=parameters),
+                    nb_zones,
+                    nb_trains,
+                    steps
+                ),
+                callback=lambda result, rank=rank: results.put(
+                    (rank, result)),
+                error_callback=lambda error, rank=rank: results.put(
+                    (rank, error))
+            )
+
+        best, errors = None, []
+        # the parameter sets may override the time limit of the agent
+        deadline = (
+            time.monotonic()
+            + max(
+                _time_limit(parameters, self.max_optimization_time)
+                for parameters in portfolio
+            )
+            + PORTFOLIO_GRACE_PERIOD
+        )
+        nb_results = 0
+        while nb_results < len(portfolio) and not self._stop_requested():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                rank, result = results.get(
+                    timeout=min(remaining, STOP_POLL_INTERVAL))
+            except queue.Empty:
+                continue
+            nb_results += 1
+            if isinstance(result, BaseException):
+                errors.append(result)
+                continue
+            if result[0] == OptimisationStatus.FAILED:
+                continue
+            if best is None or result[3] < best[1][3]:
+                best = (rank, result)
+            if result[0] == OptimisationStatus.OPTIMAL:
+                break
+    finally:
+        # stop the parameter sets still searching
+        pool.terminate()
+
+    if best is None:
+        if errors:
+            raise errors[0]
+        return OptimisationStatus.FAILED, None, None
+
+    self.portfolio_winner, (status, t_in, t_out, _, history) = best
+    if history is not None:
+        self.history.merge(history)
+    return status, t_in, t_out
@@ -0,0 +1,185 @@
+"""
+Provides the cp models of a reference schedule prepared once and reused
+across delayed schedules
+"""
+
+from collections import OrderedDict
+
+import pandas as pd
+from pyosrd.schedules import Schedule
+
+from cpagent.schedule_adapters import (
+    _schedule_layout,
+    step_table_from_schedule
+)
+from cpagent.step_table import StepTable
+
+
+class PreparedTimetable:
+    """
+    Cp models of a reference schedule, reused across delayed schedules
+
+    The layout of the reference schedule is computed once. Each structure
+    of the problem (see _structure_key) is solved by its own incremental
+    copy of the agent, whose model is built once and then only updated:
+    the domains of the steps, the overlaps and the objective change with
+    the delayed schedule. The structure only depends on the delays when
+    allow_change_order is False, the max_models most recently used
+    models are kept. The solution of a delayed schedule is not used as
+    the hint of the next one, each solve is hinted from its own delayed
+    schedule unless hint_mode is "greedy".
+    """
+
+    def __init__(
+        self,
+        agent,
+        ref_schedule: Schedule,
+        fixed_durations: pd.DataFrame = None,
+        weights: pd.DataFrame = None,
+        max_models: int = 8
+    ):
+        self.ref_schedule = ref_schedule
+        self.fixed_durations = fixed_durations
+        self.weights = weights
+        self.max_models = max_models
+        self.layout = _schedule_layout(ref_schedule)
+        self.nb_zones = len(ref_schedule.zones)
+        self.nb_trains = len(ref_schedule.trains)
+        # the model is only reused by a plain cp solve
+        self.template = agent._sub_agent(
+            incremental=True,
+            decompose=False,
+            parameter_portfolio=None,
+            engine="cp"
+        )
+        # incremental agent of each structure, least recently used first
+        self.agents = OrderedDict()
+        # status and report of the last regulation
+        self.status = None
+        self.solve_report = None
+
+        # the model of the reference schedule is the skeleton of the
+        # models of its delayed schedules
+        steps = self.steps(ref_schedule)
+        agent = self._agent(steps)
+        agent.steps = steps
+        agent._build_model()
+
+    def steps(self, delayed_schedule: Schedule) -> StepTable:
+        """Compute the steps of a delayed schedule
+
+        Parameters
+        ----------
+        delayed_schedule : Schedule
+            the delayed schedule
+
+        Returns
+        -------
+        StepTable
+            the steps of the problem
+        """
+        return step_table_from_schedule(
+            self.ref_schedule,
+            delayed_schedule,
+            self.fixed_durations,
+            self.weights,
+            self.layout
+        )
+
+    def _agent(self, steps: StepTable):
+        """Incremental agent of the structure of steps
+
+        Parameters
+        ----------
+        steps : StepTable
+            the steps of the problem
+
+        Returns
+        -------
+        CpAgent
+            the agent whose model has the structure of steps
+        """
+        self.template.nb_zones = self.nb_zones
+        self.template.steps = steps
+        key = self.template._structure_key()
+        if key in self.agents:
+            self.agents.move_to_end(key)
+            return self.agents[key]
+
+        agent = self.template._sub_agent(incremental=True)
+        agent.nb_zones = self.nb_zones
+        agent.nb_trains = self.nb_trains
+        self.agents[key] = agent
+        if len(self.agents) > self.max_models:
+            self.agents.popitem(last=False)
+        return agent
+
+    def regulate(self, delayed_schedule: Schedule) -> Schedule:
+        """Regulate a delayed schedule of the reference schedule
+
+        Parameters
+        ----------
+        delayed_schedule : Schedule
+            the delayed schedule
+
+        Returns
+        -------
+        Schedule
+            the regulated schedule, or the delayed schedule if the
+            regulation failed
+        """
+        steps = self.steps(delayed_schedule)
+        agent = self._agent(steps)
+        # the solution of another delayed schedule is a poor hint
+        agent.last_solution = None
+        regulated = agent._solve(
+            self.ref_schedule,
+            delayed_schedule,
+            self.fixed_durations,
+            self.weights,
+            steps
+        )
+        self.status = agent.status
+        self.solve_report = agent.solve_report
+        return regulated
+
+
+def prepare_timetable(
+    self,
+    ref_schedule: Schedule = None,
+    fixed_durations: pd.DataFrame = None,
+    weights: pd.DataFrame = None,
+    max_models: int = 8
+) -> PreparedTimetable:
+    """Prepare the cp models of a reference schedule to regulate many
+    delayed schedules
+
+    The settings of the agent are copied, later changes of the agent do
+    not apply to the prepared timetable. The problems are solved by a
+    single cp solve reusing the model, decompose, parameter_portfolio and
+    the greedy engine are ignored.
+
+    Parameters
+    ----------
+    ref_schedule : Schedule, optional
+        the reference schedule, the one of the agent by default
+    fixed_durations : pd.DataFrame, optional
+        steps that are fixed, the ones of the agent by default
+    weights : pd.DataFrame, optional
+        weight for each step, the ones of the agent by default
+    max_models : int, optional
+        maximum number of models kept, by default 8
+
+    Returns
+    -------
+    PreparedTimetable
+        the prepared timetable
+    """
+    if ref_schedule is None:
+        ref_schedule = self.ref_schedule
+    if fixed_durations is None:
+        fixed_durations = self.step_has_fixed_duration
+    if weights is None:
+        weights = self.weights
+    return PreparedTimetable(
+        self, ref_schedule, fixed_durations, weights, max_models)
@@ -0,0 +1,85 @@
+"""
+Provides the report of the phases of a solve
+"""
+
+import time
+from contextlib import contextmanager
+
+from ortools.sat.python import cp_model
+
+
+def _start_report(self) -> None:
+    """Start a new solve_report"""
+    self.solve_report = {"phases": {}, "model": {}, "solver": {}}
+
+
+@contextmanager
+def _phase(self, name: str):
+    """Measure the wall and cpu time of a phase of the solve in
+    solve_report
+
+    The cpu time is the one of the whole process, including the threads
+    of the solver.
+
+    Parameters
+    ----------
+    name : str
+        name of the phase
+    """
+    if self.solve_report is None:
+        self._start_report()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield
+    finally:
+        self.solve_report["phases"][name] = {
+            "wall_time": time.perf_counter() - wall_start,
+            "cpu_time": time.process_time() - cpu_start,
+        }
+
+
+def _report_model(self, model: cp_model.CpModel) -> None:
+    """Report the size of a model in solve_report
+
+    Parameters
+    ----------
+    model : cp_model.CpModel
+        the model to solve
+    """
+    proto = model.Proto()
+    self.solve_report["model"] = {
+        "steps": len(self.steps),
+        "precedences": len(self.precs),
+        "variables": len(proto.variables),
+        "constraints": len(proto.constraints),
+    }
+
+
+def _report_solver(self, solver: cp_model.CpSolver, status) -> None:
+    """Report the statistics of a solve in solve_report
+
+    CP-SAT does not report the time spent in presolve in its response,
+    the counts of booleans and integers are the ones of the presolved
+    model.
+
+    Parameters
+    ----------
+    solver : cp_model.CpSolver
+        the solver after the solve
+    status
+        the ortools status of the solve
+    """
+    response = solver.ResponseProto()
+    self.solve_report["solver"] = {
+        "status": solver.StatusName(status),
+        "objective": response.objective_value,
+        "best_bound": response.best_objective_bound,
+        "conflicts": response.num_conflicts,
+        "branches": response.num_branches,
+        "booleans": response.num_booleans,
+        "integers": response.num_integers,
+        "wall_time": response.wall_time,
+        "user_time": response.user_time,
+        "deterministic_time": response.deterministic_time,
+    }
@@ -0,0 +1,213 @@
+"""
+Provides a rolling horizon decomposition of a regulation problem
+"""
+
+import numpy as np
+
+from ortools.sat.python import cp_model
+
+from cpagent.schedule_adapters import OptimisationStatus
+from cpagent.step_table import StepTable
+
+
+def _solve_rolling_horizon(
+    self,
+    nb_zones: int,
+    nb_trains: int,
+    steps: StepTable
+) -> tuple[OptimisationStatus, np.ndarray, np.ndarray]:
+    """Solve a regulation problem window by window
+
+    The steps are sliced in time windows of window_length seconds
+    (according to their min arrival time) overlapping by window_overlap
+    seconds. Each window is solved with the steps committed by the
+    previous windows that can interact with it fixed. The steps of a
+    window starting before the next window are then committed, provided
+    their next step was part of the window and their previous step and
+    the steps sequenced before them in their zone are committed. Each
+    window is hinted with the times of the previous windows, or with the
+    greedy heuristic when hint_mode is None. If the search of a window
+    finds no solution within its time limit, the window is solved by the
+    greedy heuristic. If a window is infeasible, or the heuristic fails,
+    the steps committed by the previous window are released and solved
+    again with it. The decomposition fails if it is stopped by
+    stop_search before the last window.
+
+    A report of the decomposition is stored in rolling_horizon_report,
+    including the objective of the monolithic problem if
+    rolling_horizon_compare is True.
+
+    Parameters
+    ----------
+    nb_zones : int
+        number of zones
+    nb_trains : int
+        number of trains
+    steps : StepTable
+        the steps of the problem
+
+    Returns
+    -------
+    tuple[OptimisationStatus, np.ndarray, np.ndarray]
+        the status of the decomposition and the t_in and t_out of the steps
+    """
+    if self.window_overlap >= self.window_length:
+        raise ValueError("window_overlap must be lower than window_length")
+
+    self.nb_zones = nb_zones
+    self.nb_trains = nb_trains
+    self.steps = steps
+
+    nb_steps = len(steps)
+    t_in = steps.min_t_in.copy()
+    t_out = steps.min_t_out.copy()
+    committed = np.zeros(nb_steps, dtype=bool)
+    # steps committed by the last window
+    released = np.zeros(nb_steps, dtype=bool)
+    # successors are derived from the prev links, next being optional
+    successors = np.full(nb_steps, -1, dtype=np.int64)
+    has_prev = steps.prev >= 0
+    successors[steps.prev[has_prev]] = np.flatnonzero(has_prev)
+    second_successors = np.where(
+        successors >= 0, successors[successors], -1)
+    status = OptimisationStatus.SUBOPTIMAL
+    nb_windows = 0
+    nb_greedy_windows = 0
+
+    window_start = int(steps.min_t_in.min(initial=0))
+    while not committed.all():
+        if self._stop_requested():
+            status = OptimisationStatus.FAILED
+            break
+        window_start = max(
+            window_start, int(steps.min_t_in[~committed].min()))
+        window_end = window_start + self.window_length
+        next_start = window_end - self.window_overlap
+
+        active = ~committed & (steps.min_t_in < window_end)
+        boundary = committed & (
+            t_out + self.itinierary_setup
+            > steps.min_t_in[active].min()
+        )
+        prevs = steps.prev[active]
+        boundary[prevs[prevs >= 0]] = True
+        boundary &= committed
+
+        included = np.flatnonzero(active | boundary)
+        fixed = np.flatnonzero(boundary[included])
+        window_agent = self._sub_agent(
+            fixed_times=(
+                fixed, t_in[included][fixed], t_out[included][fixed]),
+            max_optimization_time=(
+                self.max_optimization_time
+                if self.window_time_limit is None
+                else self.window_time_limit),
+            search_stop=self.search_stop,
+            hint_mode=(
+                "greedy" if self.hint_mode is None else self.hint_mode),
+            # the "previous" hint of a window is the times of the
+            # previous windows
+            last_solution=(t_in[included], t_out[included])
+        )
+        solver, cp_status = window_agent._solve_from_steps(
+            nb_zones, nb_trains, steps.subset(included))
+        nb_windows += 1
+
+        if cp_status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            times = window_agent.last_solution
+        elif cp_status == cp_model.UNKNOWN and not self._stop_requested():
+            # the time limit was reached before a solution was found,
+            # the window is not known to be infeasible
+            times = window_agent._greedy_solution()
+            if times is not None:
+                nb_greedy_windows += 1
+        else:
+            times = None
+
+        if times is None:
+            if not released.any() or self._stop_requested():
+                status = OptimisationStatus.FAILED
+                break
+            # the previous window committed steps that block trains it
+            # did not see, they are solved again with this window
+            committed &= ~released
+            released[:] = False
+            continue
+
+        t_in[included], t_out[included] = times
+        # the departure of the last step of a train is not constrained
+        # by the objective, it leaves as soon as possible not to block
+        # the zone for the next windows
+        last = included[successors[included] < 0]
+        t_out[last] = np.maximum(
+            steps.min_t_out[last], t_in[last] + steps.min_duration[last])
+
+        if (committed | active).all():
+            committed[:] = True
+            break
+        # a step is only committed if its departure was decided
+        # knowing its next step and the itinerary of this step
+        in_window = np.zeros(nb_steps + 1, dtype=bool)
+        in_window[included] = True
+        # steps without next step point to the last position
+        in_window[-1] = True
+        candidates = (
+            active
+            & (steps.min_t_in < next_start)
+            & in_window[successors]
+            & in_window[second_successors]
+        )
+        # the committed steps are a prefix of the path of their train and
+        # of the order of their zone in the window, not to freeze a step
+        # behind a step that can still move. The departure of a committed
+        # step fixes the arrival of its next step, which must not be
+        # behind a step that can still move either.
+        order = included[np.lexsort((t_out[included], t_in[included]))]
+        zone_orders = [
+            zone_order[~committed[zone_order]]
+            for zone_order in (
+                order[steps.zone[order] == zone]
+                for zone in np.unique(steps.zone[order]).tolist()
+            )
+        ]
+        while True:
+            kept = candidates & (
+                (steps.prev < 0)
+                | committed[steps.prev]
+                | candidates[steps.prev]
+            )
+            # steps whose predecessors in their zone are committed, the
+            # last position standing for the steps without next step
+            settled = np.append(committed, True)
+            for pending in zone_orders:
+                blocked = np.flatnonzero(~candidates[pending])
+                first = blocked[0] if len(blocked) else len(pending)
+                kept[pending[first:]] = False
+                settled[pending[:first + 1]] = True
+            kept &= settled[successors]
+            if (kept == candidates).all():
+                break
+            candidates = kept
+        committed |= candidates
+        released = candidates
+        window_start = next_start
+
+    self.rolling_horizon_report = {
+        "windows": nb_windows,
+        "greedy_windows": nb_greedy_windows,
+        "objective": self._objective_value(t_in),
+    }
+    if self.rolling_horizon_compare and not self._stop_requested():
+        monolithic_agent = self._sub_agent(search_stop=self.search_stop)
+        solver, cp_status = monolithic_agent._solve_from_steps(
+            nb_zones, nb_trains, steps)
+        if (
+            monolithic_agent.status_map.get(cp_status)
+            != OptimisationStatus.FAILED
+        ):
+            monolithic = solver.ObjectiveValue()
+            self.rolling_horizon_report["monolithic_objective"] = monolithic
+            self.rolling_horizon_report["gap"] = (
+                self.rolling_horizon_report["objective"] - monolithic)
+
+    return status, t_in, t_out
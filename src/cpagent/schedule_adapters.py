@@ -5,9 +5,17 @@ from an osrd format to a constraint programming format
 from enum import Enum
 
 import copy
+import numpy as np
 import pandas as pd
 from pyosrd.schedules import Schedule
 
+from cpagent.step_table import StepTable
+
+
+# private attribute of a pyosrd Schedule holding the frame returned by
+# its df property, schedules without it are written cell by cell
+SCHEDULE_FRAME_ATTRIBUTE = "_df"
+
 
 class OptimisationStatus(Enum):
     """
@@ -16,6 +24,8 @@ class OptimisationStatus(Enum):
     OPTIMAL = 1
     SUBOPTIMAL = 2
     FAILED = 3
+    # found by the greedy heuristic
+    HEURISTIC = 4
 
 
 def build_step(idx: int, train: str, zone: int, prev_idx: int, min_t_in: int,
@@ -63,6 +73,134 @@ def build_step(idx: int, train: str, zone: int, prev_idx: int, min_t_in: int,
     }
 
 
+def _schedule_layout(
+    ref_schedule: Schedule
+) -> tuple[list, list, np.ndarray, np.ndarray]:
+    """Compute the steps layout of a reference schedule
+
+    Parameters
+    ----------
+    ref_schedule : Schedule
+        reference Schedule
+
+    Returns
+    -------
+    tuple[list, list, np.ndarray, np.ndarray]
+        the zones, the trains, and for each step (ordered by train then
+        along the train path) the index of its zone and of its train
+    """
+    zones = list(ref_schedule.zones)
+    trains = list(ref_schedule.trains)
+
+    # the path of a train is the list of its zones sorted by start time,
+    # as Schedule.path, computed for all the trains from a single frame
+    starts = ref_schedule.starts.reindex(
+        index=zones, columns=trains).to_numpy(dtype=float)
+    visited = ~np.isnan(starts)
+    order = np.argsort(
+        np.where(visited, starts, np.inf), axis=0, kind="stable")
+    path_lengths = visited.sum(axis=0)
+    in_path = np.arange(len(zones))[:, None] < path_lengths[None, :]
+    step_zones = order.T[in_path.T].astype(np.int64)
+    step_trains = np.repeat(
+        np.arange(len(trains), dtype=np.int64), path_lengths)
+
+    return zones, trains, step_zones, step_trains
+
+
+def _step_arrays(
+    ref_schedule: Schedule,
+    delayed_schedule: Schedule,
+    fixed_durations: pd.DataFrame = None,
+    weights: pd.DataFrame = None,
+    layout: tuple = None
+) -> dict[str, np.ndarray]:
+    """Compute the fields of all the steps as arrays
+
+    Parameters
+    ----------
+    ref_schedule : Schedule
+        reference Schedule
+    delayed_schedule : Schedule
+        delayed Schedule
+    fixed_durations : pd.DataFrame
+        steps that are fixed
+    weights : pd.DataFrame
+        weight for each step
+    layout : tuple, optional
+        the layout of the reference schedule computed by _schedule_layout,
+        computed if not given
+
+    Returns
+    -------
+    dict[str, np.ndarray]
+        one array per field of build_step, the train field holding
+        the index of the train in the reference schedule, and the list
+        of train labels under "train_labels"
+    """
+    zones, trains, step_zones, step_trains = (
+        _schedule_layout(ref_schedule) if layout is None else layout)
+    nb_steps = len(step_zones)
+
+    def gather(df: pd.DataFrame) -> np.ndarray:
+        return (
+            df.reindex(index=zones, columns=trains)
+            .to_numpy(dtype=float)[step_zones, step_trains]
+        )
+
+    starts = gather(delayed_schedule.starts)
+    ends = gather(delayed_schedule.ends)
+    min_times = gather(delayed_schedule.min_durations)
+
+    idx = np.arange(nb_steps, dtype=np.int64)
+    is_first = np.ones(nb_steps, dtype=bool)
+    is_first[1:] = step_trains[1:] != step_trains[:-1]
+    is_last = np.ones(nb_steps, dtype=bool)
+    is_last[:-1] = is_first[1:]
+    prev = np.where(is_first, -1, idx - 1)
+    next = np.where(is_last, -1, idx + 1)
+
+    overlap = np.zeros(nb_steps, dtype=np.int64)
+    overlap[~is_first] = np.maximum(
+        0,
+        np.trunc(ends[prev[~is_first]] - starts[~is_first]).astype(np.int64))
+
+    # the steps of zones or trains missing from fixed_durations and
+    # weights get the defaults of build_step
+    if fixed_durations is None:
+        is_fixed = np.zeros(nb_steps, dtype=bool)
+    else:
+        is_fixed = (
+            fixed_durations.reindex(index=zones, fill_value=False)
+            .iloc[:, :len(trains)]
+            .to_numpy()[step_zones, step_trains]
+            .astype(bool)
+        )
+
+    if weights is None:
+        ponderation = np.ones(nb_steps, dtype=np.int64)
+    else:
+        ponderation = (
+            weights.reindex(index=zones, columns=trains, fill_value=1)
+            .to_numpy()[step_zones, step_trains]
+        )
+
+    return {
+        "idx": idx,
+        "train": step_trains,
+        "zone": step_zones,
+        "prev": prev,
+        "next": next,
+        "min_t_in": starts.astype(np.int64),
+        "min_t_out": ends.astype(np.int64),
+        "min_duration": min_times.astype(np.int64),
+        "is_fixed": is_fixed,
+        "ponderation": ponderation,
+        "overlap": overlap,
+        "train_labels": trains,
+    }
+
+
 def steps_from_schedule(
     ref_schedule: Schedule,
     delayed_schedule: Schedule,
@@ -87,74 +225,65 @@ def steps_from_schedule(
     list[dict]
         A list of steps where information is stored in dictionnary
     """
-    zones = ref_schedule.zones
-    trains = ref_schedule.trains
-
-    delayed_starts = delayed_schedule.starts
-    delayed_ends = delayed_schedule.ends
-    min_times = delayed_schedule.min_durations
-
-    steps = []
-
-    global_idx = 0
-    for train_idx, train in enumerate(trains):
-        prev_step = -1
-        prev_zone = None
-        for zone in ref_schedule.path(train):
-            overlap = 0
-            if prev_zone is not None:
-                overlap = max(0, int(delayed_ends.loc[prev_zone, train]
-                              - delayed_starts.loc[zone, train]))
-            is_fixed = (
-                True
-                if (fixed_durations is not None
-                    and fixed_durations.loc[zone, fixed_durations.columns[train_idx]])
-                else False
-            )
-            ponderation = (
-                1
-                if weights is None
-                else weights.loc[zone, train]
-            )
-
-            if prev_step >= 0:
-                steps[prev_step]["next"] = global_idx
-
-            steps.append(build_step(
-                idx=global_idx,
-                train=train,
-                zone=zones.index(zone),
-                prev_idx=prev_step,
-                min_t_in=int(delayed_starts.loc[zone, train]),
-                min_t_out=int(delayed_ends.loc[zone, train]),
-                min_duration=int(min_times.loc[zone, train]),
-                is_fixed=is_fixed,
-                ponderation=ponderation,
-                overlap=overlap
-            ))
-            prev_zone = zone
-            prev_step = len(steps) - 1
-            global_idx = global_idx + 1
-
-    return steps
+    return step_table_from_schedule(
+        ref_schedule, delayed_schedule, fixed_durations, weights
+    ).to_steps()
+
+
+def step_table_from_schedule(
+    ref_schedule: Schedule,
+    delayed_schedule: Schedule,
+    fixed_durations: pd.DataFrame = None,
+    weights: pd.DataFrame = None,
+    layout: tuple = None
+) -> StepTable:
+    """Convert a problem from a schedule format to a StepTable
+
+    Parameters
+    ----------
+    ref_schedule : Schedule
+        reference Schedule
+    delayed_schedule : Schedule
+        delayed Schedule
+    fixed_durations : pd.DataFrame
+        steps that are fixed
+    weights : pd.DataFrame
+        weight for each step
+    layout : tuple, optional
+        the layout of the reference schedule computed by _schedule_layout,
+        to share it between several delayed schedules
+
+    Returns
+    -------
+    StepTable
+        the steps in a columnar format
+    """
+    return StepTable(**_step_arrays(
+        ref_schedule, delayed_schedule, fixed_durations, weights, layout))
 
 
 def schedule_from_solution(
         ref_schedule: Schedule,
         status: OptimisationStatus,
-        steps: list[dict],
+        steps: StepTable | list[dict],
         t_in: list[int],
         t_out: list[int]) -> Schedule:
     """Generate a regulated Schedule from cp results
 
+    All the arrival and departure times are written at once in a copy of
+    the frame of the reference schedule, the rest of the schedule being
+    copied. If the schedule does not keep its frame in
+    SCHEDULE_FRAME_ATTRIBUTE, a copy of it is written cell by cell with
+    its set method.
+
     Parameters
     ----------
     ref_schedule : Schedule
         ref schedule
     status : OptimisationStatus
         cp status of the optimize
-    steps : list[dict]
-        the list of steps
+    steps : StepTable | list[dict]
+        the steps
     t_in : list[int]
         time of t_in
     t_out : list[int]
@@ -165,12 +294,19 @@ def schedule_from_solution(
     Schedule
         regulated schedule
     """
-    regulated_schedule = copy.deepcopy(ref_schedule)
-    zones = regulated_schedule.zones
-
     if status == OptimisationStatus.FAILED:
         return None
 
+    if not isinstance(steps, StepTable):
+        steps = StepTable.from_steps(steps)
+
+    regulated_schedule = _schedule_with_times(ref_schedule, steps, t_in, t_out)
+    if regulated_schedule is not None:
+        return regulated_schedule
+
+    # the schedule does not expose its frame, fall back to cell by cell
+    regulated_schedule = copy.deepcopy(ref_schedule)
+    zones = regulated_schedule.zones
     for step_idx, step in enumerate(steps):
         regulated_schedule.set(
             step['train'],
@@ -178,3 +314,60 @@ def schedule_from_solution(
             (t_in[step_idx], t_out[step_idx]))
 
     return regulated_schedule
+
+
+def _schedule_with_times(
+        ref_schedule: Schedule,
+        steps: StepTable,
+        t_in: list[int],
+        t_out: list[int]) -> Schedule | None:
+    """Copy a schedule replacing the times of the steps in one assignment
+
+    Parameters
+    ----------
+    ref_schedule : Schedule
+        ref schedule
+    steps : StepTable
+        the steps
+    t_in : list[int]
+        time of t_in
+    t_out : list[int]
+        time of t_out
+
+    Returns
+    -------
+    Schedule | None
+        the new schedule, or None if the frame of the schedule cannot
+        be written in bulk
+    """
+    df = ref_schedule.df
+    if (
+        not hasattr(ref_schedule, SCHEDULE_FRAME_ATTRIBUTE)
+        or getattr(ref_schedule, SCHEDULE_FRAME_ATTRIBUTE) is not df
+    ):
+        return None
+
+    zones = np.asarray(ref_schedule.zones, dtype=object)
+    trains = np.asarray(steps.train_labels, dtype=object)[steps.train]
+    rows = df.index.get_indexer(zones[steps.zone])
+    cols_in = df.columns.get_indexer(
+        pd.MultiIndex.from_arrays([trains, ['s'] * len(steps)]))
+    cols_out = df.columns.get_indexer(
+        pd.MultiIndex.from_arrays([trains, ['e'] * len(steps)]))
+    if (rows < 0).any() or (cols_in < 0).any() or (cols_out < 0).any():
+        return None
+
+    values = df.to_numpy(dtype=float, copy=True)
+    values[rows, cols_in] = t_in
+    values[rows, cols_out] = t_out
+    regulated_df = pd.DataFrame(
+        values, index=df.index, columns=df.columns
+    ).astype(df.dtypes.to_dict())
+
+    # the rest of the schedule is copied, the frame being replaced by the
+    # regulated one instead of being copied
+    regulated_schedule = copy.deepcopy(
+        ref_schedule, memo={id(df): regulated_df})
+    if regulated_schedule.df is not regulated_df:
+        return None
+    return regulated_schedule
@@ -2,16 +2,25 @@
 Implements a OrtoolsRegulationSolver using Ortools solver
 """
 
+import copy
+import threading
+
+import numpy as np
 import pandas as pd
 
+from google.protobuf import json_format, text_format
+from ortools.sat import sat_parameters_pb2
 from ortools.sat.python import cp_model
 from pyosrd.schedules import Schedule
 
+from cpagent.history import SolveHistory
 from cpagent.schedule_adapters import (
-    steps_from_schedule,
+    step_table_from_schedule,
     schedule_from_solution,
     OptimisationStatus
 )
+from cpagent.step_table import StepTable
+from cpagent.streaming import ImprovingSolution
 
 
 def _solve(
@@ -19,50 +28,256 @@ def _solve(
     ref_schedule: Schedule,
     delayed_schedule: Schedule,
     fixed_durations: pd.DataFrame = None,
-    weights: pd.DataFrame = None
+    weights: pd.DataFrame = None,
+    steps: StepTable = None
 ) -> Schedule:
     """Solves a cp regulation problem using the solver CP-SAT of ortools
 
+    The gap to the best bound is only reported for a plain cp solve. It
+    is None when the problem is decomposed, solved by a rolling horizon,
+    a parameter portfolio or the greedy heuristic, the gap limits then
+    applying to each sub solve separately.
+
     Parameters
     ----------
+    steps : StepTable, optional
+        the steps of the problem if already computed from the schedules
 
     Returns
     -------
     Schedule
         the refulated schedule
     """
+    self._start_report()
+    if self.search_stop is None:
+        # a copy of the agent gets its SearchStop before its solve is
+        # started in a thread, a stop requested in between is kept
+        self.search_stop = SearchStop()
+    try:
+        if steps is None:
+            with self._phase("steps_from_schedule"):
+                steps = step_table_from_schedule(
+                    ref_schedule, delayed_schedule, fixed_durations, weights)
+        if self.engine == "greedy":
+            solve = self._solve_greedy
+        elif self.engine != "cp":
+            raise ValueError(
+                f"unknown engine {self.engine!r}, expected 'cp' or 'greedy'")
+        elif self.decompose:
+            solve = self._solve_components
+        elif self.rolling_horizon:
+            solve = self._solve_rolling_horizon
+        elif self.parameter_portfolio:
+            solve = self._solve_portfolio
+        else:
+            solve = None
 
-    solver, status = self._solve_from_steps(
-        len(ref_schedule.zones),
-        len(ref_schedule.trains),
-        steps_from_schedule(ref_schedule, delayed_schedule,
-                            fixed_durations, weights)
-    )
-    return self._get_solution(solver, status, ref_schedule, delayed_schedule)
+        nb_zones = len(ref_schedule.zones)
+        nb_trains = len(ref_schedule.trains)
+        if solve is not None:
+            with self._phase("solve"):
+                status, t_in, t_out = solve(nb_zones, nb_trains, steps)
+            self.gap = None
+        else:
+            adapter_phases = self.solve_report["phases"]
+            self._solve_from_steps(nb_zones, nb_trains, steps)
+            # _solve_from_steps starts a new report
+            self.solve_report["phases"] = {
+                **adapter_phases, **self.solve_report["phases"]}
+            status = self.status
+            t_in, t_out = (
+                (None, None) if status == OptimisationStatus.FAILED
+                else self.last_solution)
+
+        if status == OptimisationStatus.FAILED and self.greedy_fallback:
+            with self._phase("greedy_fallback"):
+                status, t_in, t_out = self._solve_greedy(
+                    nb_zones, nb_trains, steps)
+            self.gap = None
+        self.status = status
+        if status != OptimisationStatus.FAILED:
+            self.last_solution = (t_in, t_out)
+
+        with self._phase("schedule_from_solution"):
+            return self._schedule_from_times(
+                status, t_in, t_out, ref_schedule, delayed_schedule)
+    finally:
+        # a stop requested after the solve does not affect the next one
+        self.search_stop = None
 
 
 def _solve_from_steps(
     self,
-    nb_zones,
-    nb_trains,
-    steps
-):
+    nb_zones: int,
+    nb_trains: int,
+    steps: StepTable | list[dict]
+) -> tuple[cp_model.CpSolver, int]:
+    """Build and solve the cp model of a regulation problem
+
+    The time of each phase, the size of the model and the statistics
+    of the solver are reported in solve_report. The status of the solve
+    is stored in status and the relative gap between the objective and
+    its best bound in gap. A solve stopped by relative_gap_limit or
+    absolute_gap_limit before proving optimality is SUBOPTIMAL.
+
+    Parameters
+    ----------
+    nb_zones : int
+        number of zones
+    nb_trains : int
+        number of trains
+    steps : StepTable | list[dict]
+        the steps of the problem, a list of steps built by build_step
+        is converted to a StepTable
+
+    Returns
+    -------
+    tuple[cp_model.CpSolver, int]
+        the solver and the ortools status of the solve
+    """
     self.nb_zones = nb_zones
     self.nb_trains = nb_trains
-    self.steps = steps
+    self.steps = (
+        steps if isinstance(steps, StepTable)
+        else StepTable.from_steps(steps)
+    )
 
-    model = cp_model.CpModel()
-    self.history = []
-    self._create_variables(model)
-    self._create_constraints(model)
-    self._create_objective(model)
+    self._start_report()
+    self.history = SolveHistory(self.history_capacity)
+    model = self._build_model()
+    self._report_model(model)
+    if self.hint_mode is not None or self.incremental:
+        with self._phase("add_hints"):
+            self._add_hints(model)
     solver = cp_model.CpSolver()
     solver.parameters.max_time_in_seconds = self.max_optimization_time
-    status = solver.Solve(
-        model, HistoryHandler(self) if self.save_history else None)
+    solver.parameters.repair_hint = self.repair_hint
+    if self.relative_gap_limit is not None:
+        solver.parameters.relative_gap_limit = self.relative_gap_limit
+    if self.absolute_gap_limit is not None:
+        solver.parameters.absolute_gap_limit = self.absolute_gap_limit
+    self._apply_solver_parameters(solver)
+    self.running_solver = solver
+    search_stop = self.search_stop
+    if search_stop is not None and search_stop.add(solver):
+        # stopped before the search started, the solve returns at once
+        solver.parameters.max_time_in_seconds = 0
+    try:
+        with self._phase("solve"):
+            status = solver.Solve(
+                model,
+                SolutionHandler(self)
+                if self.save_history or self.solution_callback is not None
+                else None
+            )
+    finally:
+        self.running_solver = None
+        if search_stop is not None:
+            search_stop.discard(solver)
+    self._report_solver(solver, status)
+    self.status = self.status_map.get(status, OptimisationStatus.FAILED)
+    self.gap = None
+    if self.status != OptimisationStatus.FAILED:
+        objective = solver.ObjectiveValue()
+        bound = solver.BestObjectiveBound()
+        self.gap = abs(objective - bound) / max(1, abs(objective))
+        if self.status == OptimisationStatus.OPTIMAL and self.gap > 0:
+            # CP-SAT reports OPTIMAL when a gap limit is reached
+            self.status = OptimisationStatus.SUBOPTIMAL
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        self.last_solution = (
+            solver.Values(self.t_in).to_numpy(),
+            solver.Values(self.t_out).to_numpy()
+        )
     return solver, status
 
 
+def stop_search(self) -> None:
+    """Stop the solve in progress, if any, from another thread
+
+    The cp searches of the agent and of the copies solving its sub
+    problems return the best solution found so far, the remaining windows
+    of a rolling horizon are not solved and the processes solving sub
+    problems are terminated, their solutions being lost. A stop requested
+    while the model is built is applied when the search starts, a search
+    that was just starting may miss it, the stop then has to be repeated.
+    """
+    if self.search_stop is not None:
+        self.search_stop.stop()
+    solver = self.running_solver
+    if solver is not None:
+        solver.StopSearch()
+
+
+def _stop_requested(self) -> bool:
+    """Check if stop_search was called during the solve in progress
+
+    Returns
+    -------
+    bool
+        True if the solve must stop
+    """
+    return self.search_stop is not None and self.search_stop.requested
+
+
+def _apply_solver_parameters(self, solver: cp_model.CpSolver) -> None:
+    """Set the parameters of solver_parameters on a solver
+
+    solver_parameters maps names of SatParameters fields to their values,
+    enum values being given by their names, e.g.
+    {"num_workers": 8, "search_branching": "FIXED_SEARCH"}.
+    They override max_optimization_time and repair_hint.
+
+    Parameters
+    ----------
+    solver : cp_model.CpSolver
+        the solver to configure
+    """
+    if not self.solver_parameters:
+        return
+    parameters = json_format.ParseDict(
+        self.solver_parameters, sat_parameters_pb2.SatParameters())
+    if hasattr(solver.parameters, "merge_text_format"):
+        solver.parameters.merge_text_format(
+            text_format.MessageToString(parameters))
+    else:
+        solver.parameters.MergeFrom(parameters)
+
+
+def _build_model(self) -> cp_model.CpModel:
+    """Build the cp model of the current steps
+
+    In incremental mode, the model of the previous solve is kept and
+    updated in place if the structure of the problem did not change.
+
+    Returns
+    -------
+    cp_model.CpModel
+        the model to solve
+    """
+    if self.incremental:
+        key = self._structure_key()
+        if self.model is not None and key == self.model_key:
+            with self._phase("update_model"):
+                self._update_model(self.model, self.model_overlap)
+            self.model_overlap = self.steps.overlap
+            return self.model
+
+    model = cp_model.CpModel()
+    with self._phase("create_variables"):
+        self._create_variables(model)
+    with self._phase("create_constraints"):
+        self._create_constraints(model)
+    with self._phase("create_objective"):
+        self._create_objective(model)
+
+    if self.incremental:
+        self.model = model
+        self.model_key = key
+        self.model_overlap = self.steps.overlap
+    return model
+
+
 def _get_solution(
     self,
     solver: cp_model.CpSolver,
@@ -88,27 +303,150 @@ def _get_solution(
     if status == OptimisationStatus.FAILED:
         return delayed_schedule
 
+    return self._schedule_from_times(
+        status,
+        solver.Values(self.t_in).to_list(),
+        solver.Values(self.t_out).to_list(),
+        ref_schedule,
+        delayed_schedule)
+
+
+def _schedule_from_times(
+    self,
+    status: OptimisationStatus,
+    t_in: list[int],
+    t_out: list[int],
+    ref_schedule: Schedule,
+    delayed_schedule: Schedule,
+) -> Schedule:
+    """Generates the regulated Schedule from the times of the steps
+
+    Parameters
+    ----------
+    status : OptimisationStatus
+        status of the optimisation
+    t_in : list[int]
+        arrival time of each step
+    t_out : list[int]
+        departure time of each step
+
+    Returns
+    -------
+    Schedule
+        result regulated schedule or the delayed
+        schedule if optimization failed
+    """
+    if status == OptimisationStatus.FAILED:
+        return delayed_schedule
+
     return schedule_from_solution(
         ref_schedule,
         status,
         self.steps,
-        solver.Values(self.t_in).to_list(),
-        solver.Values(self.t_out).to_list())
+        t_in,
+        t_out)
 
 
-class HistoryHandler(cp_model.CpSolverSolutionCallback):
+def _sub_agent(self, **attributes):
+    """Copy the agent to solve a sub problem without altering its state
+
+    Parameters
+    ----------
+    **attributes
+        attributes to set on the copy
+
+    Returns
+    -------
+    CpAgent
+        a copy of the agent with a fresh solve state
+    """
+    agent = copy.copy(self)
+    agent.rolling_horizon = False
+    agent.incremental = False
+    agent.model = None
+    agent.current_time = None
+    agent.last_solution = None
+    agent.fixed_times = None
+    agent.solution_callback = None
+    agent.search_stop = SearchStop()
+    for name, value in attributes.items():
+        setattr(agent, name, value)
+    return agent
+
+
+class SolutionHandler(cp_model.CpSolverSolutionCallback):
+    """
+    Records the history of the solve if save_history is True and passes
+    each solution to the solution_callback of the agent
+    """
 
     def __init__(self, solver):
         cp_model.CpSolverSolutionCallback.__init__(self)
         self.solver = solver
+        self.t_in_indices = np.array(
+            [variable.Index() for variable in solver.t_in], dtype=np.int64)
+        self.t_out_indices = np.array(
+            [variable.Index() for variable in solver.t_out], dtype=np.int64)
 
     def on_solution_callback(self):
         """Called each time a new best solution is found by the solver
         """
-        self.solver.history.append(
-            (
+        if self.solver.save_history:
+            self.solver.history.record(
                 self.UserTime(),
                 self.ObjectiveValue(),
                 self.BestObjectiveBound()
             )
-        )
+        if self.solver.solution_callback is not None:
+            solution = np.asarray(self.Response().solution, dtype=np.int64)
+            self.solver.solution_callback(ImprovingSolution(
+                self.ObjectiveValue(),
+                self.BestObjectiveBound(),
+                self.WallTime(),
+                solution[self.t_in_indices],
+                solution[self.t_out_indices]
+            ))
+
+
+# former name of SolutionHandler
+HistoryHandler = SolutionHandler
+
+
+class SearchStop:
+    """
+    Stop requests of a solve, shared by the agent and the copies solving
+    its sub problems
+    """
+
+    def __init__(self):
+        self.requested = False
+        # cp solvers searching in threads
+        self.solvers = set()
+        self.lock = threading.Lock()
+
+    def stop(self) -> None:
+        """Request the stop of the solve and stop the searches in progress
+        """
+        with self.lock:
+            self.requested = True
+            solvers = list(self.solvers)
+        for solver in solvers:
+            solver.StopSearch()
+
+    def add(self, solver: cp_model.CpSolver) -> bool:
+        """Register a solver starting its search
+
+        Returns
+        -------
+        bool
+            True if the stop was already requested, the search must not
+            be done
+        """
+        with self.lock:
+            self.solvers.add(solver)
+            return self.requested
+
+    def discard(self, solver: cp_model.CpSolver) -> None:
+        """Unregister a solver whose search is done"""
+        with self.lock:
+            self.solvers.discard(solver)
@@ -0,0 +1,230 @@
+"""
+Provides a columnar container for the steps of a regulation problem
+"""
+
+import numpy as np
+
+
+class StepTable:
+    """
+    Columnar storage of the steps of a regulation problem
+
+    Each field of a step (as built by build_step) is stored in a numpy
+    array indexed by the step index. Train labels are integer-encoded,
+    the labels themselves being stored once in train_labels.
+
+    Iterating over a StepTable or indexing it with an integer gives
+    the steps as dictionnaries, for compatibility with list of steps.
+    """
+
+    def __init__(
+        self,
+        train: np.ndarray,
+        zone: np.ndarray,
+        prev: np.ndarray,
+        next: np.ndarray,
+        min_t_in: np.ndarray,
+        min_t_out: np.ndarray,
+        min_duration: np.ndarray,
+        is_fixed: np.ndarray,
+        ponderation: np.ndarray = None,
+        overlap: np.ndarray = None,
+        train_labels: list = None,
+        idx: np.ndarray = None
+    ):
+        """
+        Parameters
+        ----------
+        train : np.ndarray
+            index of the train of each step in train_labels
+        zone : np.ndarray
+            index of the zone of each step
+        prev : np.ndarray
+            index of the previous step (-1 if none)
+        next : np.ndarray
+            index of the next step (-1 if none)
+        min_t_in : np.ndarray
+            min arrival time of each step
+        min_t_out : np.ndarray
+            min departure time of each step
+        min_duration : np.ndarray
+            min duration of each step
+        is_fixed : np.ndarray
+            true if the duration of the step is fixed
+        ponderation : np.ndarray, optional
+            ponderation of each step in the objective, 1 by default
+        overlap : np.ndarray, optional
+            overlap duration of each step, 0 by default
+        train_labels : list, optional
+            labels of the trains, the train indices by default
+        idx : np.ndarray, optional
+            index of each step, its position by default
+        """
+        nb_steps = len(zone)
+        self.train = np.asarray(train, dtype=np.int32)
+        self.zone = np.asarray(zone, dtype=np.int32)
+        self.prev = np.asarray(prev, dtype=np.int32)
+        self.next = np.asarray(next, dtype=np.int32)
+        self.min_t_in = np.asarray(min_t_in, dtype=np.int64)
+        self.min_t_out = np.asarray(min_t_out, dtype=np.int64)
+        self.min_duration = np.asarray(min_duration, dtype=np.int64)
+        self.is_fixed = np.asarray(is_fixed, dtype=bool)
+        self.ponderation = (
+            np.ones(nb_steps, dtype=np.int64)
+            if ponderation is None
+            else np.asarray(ponderation)
+        )
+        self.overlap = (
+            np.zeros(nb_steps, dtype=np.int64)
+            if overlap is None
+            else np.asarray(overlap, dtype=np.int64)
+        )
+        self.idx = (
+            np.arange(nb_steps, dtype=np.int32)
+            if idx is None
+            else np.asarray(idx, dtype=np.int32)
+        )
+        self.train_labels = (
+            list(range(int(self.train.max(initial=-1)) + 1))
+            if train_labels is None
+            else list(train_labels)
+        )
+
+    @classmethod
+    def from_steps(cls, steps: list[dict]) -> "StepTable":
+        """Build a StepTable from a list of steps built by build_step
+
+        Parameters
+        ----------
+        steps : list[dict]
+            the list of steps
+
+        Returns
+        -------
+        StepTable
+            the steps in a columnar format
+        """
+        train_codes = {}
+        for step in steps:
+            train_codes.setdefault(step["train"], len(train_codes))
+
+        def column(field):
+            return [step[field] for step in steps]
+
+        return cls(
+            train=[train_codes[step["train"]] for step in steps],
+            zone=column("zone"),
+            prev=column("prev"),
+            next=column("next"),
+            min_t_in=column("min_t_in"),
+            min_t_out=column("min_t_out"),
+            min_duration=column("min_duration"),
+            is_fixed=column("is_fixed"),
+            ponderation=column("ponderation"),
+            overlap=column("overlap"),
+            train_labels=list(train_codes),
+            idx=column("idx"),
+        )
+
+    def __len__(self) -> int:
+        return len(self.zone)
+
+    def __getitem__(self, i: int) -> dict:
+        return self._step(i)
+
+    def __iter__(self):
+        return iter(self.to_steps())
+
+    def _step(self, i: int) -> dict:
+        return {
+            "idx": int(self.idx[i]),
+            "train": self.train_labels[self.train[i]],
+            "zone": int(self.zone[i]),
+            "prev": int(self.prev[i]),
+            "next": int(self.next[i]),
+            "min_t_in": int(self.min_t_in[i]),
+            "min_t_out": int(self.min_t_out[i]),
+            "min_duration": int(self.min_duration[i]),
+            "is_fixed": bool(self.is_fixed[i]),
+            "ponderation": self.ponderation[i].item(),
+            "overlap": int(self.overlap[i]),
+        }
+
+    def to_steps(self) -> list[dict]:
+        """Convert the table to a list of steps as built by build_step
+
+        Returns
+        -------
+        list[dict]
+            the list of steps
+        """
+        columns = [
+            getattr(self, field).tolist()
+            for field in (
+                "idx", "train", "zone", "prev", "next", "min_t_in",
+                "min_t_out", "min_duration", "is_fixed", "ponderation",
+                "overlap")
+        ]
+        return [
+            {
+                "idx": idx,
+                "train": self.train_labels[train],
+                "zone": zone,
+                "prev": prev,
+                "next": next,
+                "min_t_in": min_t_in,
+                "min_t_out": min_t_out,
+                "min_duration": min_duration,
+                "is_fixed": is_fixed,
+                "ponderation": ponderation,
+                "overlap": overlap,
+            }
+            for (idx, train, zone, prev, next, min_t_in, min_t_out,
+                 min_duration, is_fixed, ponderation, overlap) in zip(*columns)
+        ]
+
+    def steps_per_zone(self) -> dict[int, np.ndarray]:
+        """Group the steps by zone
+
+        Returns
+        -------
+        dict[int, np.ndarray]
+            for each zone with at least one step, the sorted indices
+            of its steps
+        """
+        order = np.argsort(self.zone, kind="stable")
+        zones, starts = np.unique(self.zone[order], return_index=True)
+        return dict(zip(zones.tolist(), np.split(order, starts[1:])))
+
+    def subset(self, indices: np.ndarray) -> "StepTable":
+        """Extract some steps in a new table
+
+        Parameters
+        ----------
+        indices : np.ndarray
+            sorted indices of the steps to extract
+
+        Returns
+        -------
+        StepTable
+            the extracted steps, reindexed from 0, with links to steps
+            that are not extracted replaced by -1
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        positions = np.full(len(self) + 1, -1, dtype=np.int64)
+        positions[indices] = np.arange(len(indices))
+
+        # a link -1 points to the last position, which is always -1
+        return StepTable(
+            train=self.train[indices],
+            zone=self.zone[indices],
+            prev=positions[self.prev[indices]],
+            next=positions[self.next[indices]],
+            min_t_in=self.min_t_in[indices],
+            min_t_out=self.min_t_out[indices],
+            min_duration=self.min_duration[indices],
+            is_fixed=self.is_fixed[indices],
+            ponderation=self.ponderation[indices],
+            overlap=self.overlap[indices],
+            train_labels=self.train_labels,
+        )
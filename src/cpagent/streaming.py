@@ -0,0 +1,129 @@
+"""
+Provides the streaming of the improving solutions of a regulation
+"""
+
+import queue
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from pyosrd.schedules import Schedule
+
+from cpagent.asynchronous import STOP_POLL_INTERVAL
+from cpagent.schedule_adapters import (
+    schedule_from_solution,
+    OptimisationStatus
+)
+
+
+@dataclass
+class ImprovingSolution:
+    """
+    A solution of a regulation, better than the previous ones
+    """
+    objective: float
+    # None if the solution was not found by a cp solve
+    best_bound: float
+    # seconds since the start of the solve
+    wall_time: float
+    t_in: np.ndarray
+    t_out: np.ndarray
+    # only built if requested
+    schedule: Schedule = None
+
+
+def solve_stream(
+    self,
+    ref_schedule: Schedule = None,
+    delayed_schedule: Schedule = None,
+    fixed_durations: pd.DataFrame = None,
+    weights: pd.DataFrame = None,
+    materialize: bool = False
+) -> Iterator[ImprovingSolution]:
+    """Regulate a delayed schedule in a thread, yielding each improving
+    solution as soon as the solver finds it
+
+    The problem is solved by a copy of the agent, whose state is not
+    modified. Engines finding no intermediate solutions (greedy,
+    decomposition, rolling horizon or portfolio) yield their final
+    solution only. Closing the generator stops the search.
+
+    Parameters
+    ----------
+    ref_schedule : Schedule, optional
+        the reference schedule, the one of the agent by default
+    delayed_schedule : Schedule, optional
+        the delayed schedule, the one of the agent by default
+    fixed_durations : pd.DataFrame, optional
+        steps that are fixed, the ones of the agent by default
+    weights : pd.DataFrame, optional
+        weight for each step, the ones of the agent by default
+    materialize : bool, optional
+        build the regulated Schedule of each solution, by default False
+
+    Yields
+    ------
+    ImprovingSolution
+        each solution better than the previous ones
+    """
+    if ref_schedule is None:
+        ref_schedule = self.ref_schedule
+    if delayed_schedule is None:
+        delayed_schedule = self.delayed_schedule
+    if fixed_durations is None:
+        fixed_durations = self.step_has_fixed_duration
+    if weights is None:
+        weights = self.weights
+
+    solutions = queue.Queue()
+    agent = self._sub_agent(
+        solution_callback=solutions.put,
+        rolling_horizon=self.rolling_horizon
+    )
+    errors = []
+    start = time.perf_counter()
+
+    def solve():
+        try:
+            agent._solve(
+                ref_schedule, delayed_schedule, fixed_durations, weights)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            # end of the stream
+            solutions.put(None)
+
+    thread = threading.Thread(target=solve, daemon=True)
+    thread.start()
+    streamed = False
+    try:
+        while (solution := solutions.get()) is not None:
+            streamed = True
+            if materialize:
+                solution.schedule = schedule_from_solution(
+                    ref_schedule, OptimisationStatus.SUBOPTIMAL,
+                    agent.steps, solution.t_in, solution.t_out)
+            yield solution
+    finally:
+        # the consumer may stop early
+        while thread.is_alive():
+            agent.stop_search()
+            thread.join(STOP_POLL_INTERVAL)
+
+    if errors:
+        raise errors[0]
+    if not streamed and agent.status != OptimisationStatus.FAILED:
+        t_in, t_out = agent.last_solution
+        yield ImprovingSolution(
+            agent._objective_value(t_in),
+            None,
+            time.perf_counter() - start,
+            t_in,
+            t_out,
+            schedule_from_solution(
+                ref_schedule, agent.status, agent.steps, t_in, t_out)
+            if materialize else None
+        )
@@ -1,5 +1,9 @@
+import numpy as np
+
 from ortools.sat.python import cp_model
 
+from cpagent.greedy import greedy_times
+
 
 def _create_variables(
         self,
@@ -11,32 +15,38 @@ def _create_variables(
     model : cp_model.CpModel
         The model to fill
     """
+    if self.lean_model:
+        self._create_lean_variables(model)
+        return
+    steps = self.steps
+    self.domains = self._step_domains()
+    t_in_lb, t_in_ub, t_out_lb, t_out_ub, duration_lb, duration_ub = (
+        bound.tolist() for bound in self.domains)
     self.t_in = [
         model.NewIntVar(
-            step['min_t_in'],
-            cp_model.INT32_MAX,
+            t_in_lb[i],
+            t_in_ub[i],
             f"t_in[{i}]")
-        for i, step in enumerate(self.steps)]
+        for i in range(len(steps))]
     self.t_out = [
         model.NewIntVar(
-            step['min_t_out'],
-            cp_model.INT32_MAX,
+            t_out_lb[i],
+            t_out_ub[i],
             f"t_out[{i}]")
-        for i, step in enumerate(self.steps)]
+        for i in range(len(steps))]
     self.durations = [
         model.NewIntVar(
-            step['min_duration'],
-            step['min_duration'] if step['is_fixed']
-            else cp_model.INT32_MAX,
+            duration_lb[i],
+            duration_ub[i],
             f"durations[{i}]")
-        for i, step in enumerate(self.steps)]
+        for i in range(len(steps))]
     self.intervals = [
         model.NewIntervalVar(
             self.t_in[i],
             self.durations[i],
             self.t_out[i],
             f"t_out[{i}]")
-        for i, step in enumerate(self.steps)]
+        for i in range(len(steps))]
 
     # Precedence variables
 
@@ -44,52 +54,222 @@ def _create_variables(
     # last_si : 1 if the step si is the last step to pass in its zone
     # prec_si_sj : 1 if the step si is just before the step sj
     #               for this to be true the two steps needs to be the same zone
-    #               and different trains
-    # diff_itinerary_si_sj : 1 if the step si and sj have a different zone
-    #                        AFTER the one they share
+    #               and different trains, precs is a dict indexed by (si, sj)
+    #               holding only these pairs
 
     self.firsts = [
         model.NewIntVar(
             0,
             1,
             f"first_s{i}")
-        for i, _ in enumerate(self.steps)]
+        for i in range(len(steps))]
     self.lasts = [
         model.NewIntVar(
             0,
             1,
             f"last_s{i}")
-        for i, _ in enumerate(self.steps)]
-    self.precs = [
-        [
-            model.NewIntVar(
-                0,
-                1 if (
-                    step_i["train"] != step_j["train"]
-                    and step_i["zone"] == step_j["zone"]
-                )
-                else 0,
-                f"prec_s{i}_s{j}")
-            for i, step_i in enumerate(self.steps)
-        ]
-        for j, step_j in enumerate(self.steps)
-    ]
-
-    self.diff_itineraries = [
-        [
-            model.NewIntVar(
-                1 if (
-                    step_i["next"] >= 0
-                    and step_j["next"] >= 0
-                    and (
-                        self.steps[step_i["next"]]["zone"]
-                        != self.steps[step_j["next"]]["zone"]
-                    )
-                )
-                else 0,
-                1,
-                f"diff_itinierary_s{i}_s{j}")
-            for i, step_i in enumerate(self.steps)
-        ]
-        for j, step_j in enumerate(self.steps)
-    ]
+        for i in range(len(steps))]
+    # only pairs of steps of different trains sharing a zone can follow
+    # each other, so precedence variables are only created for them.
+    # They are created in the order of the steps as the default search
+    # of CP-SAT is sensitive to the order of the variables
+    self._compute_diff_itineraries()
+
+    trains = steps.train.tolist()
+    zones = steps.zone.tolist()
+    self.precs = {}
+    for i in range(len(steps)):
+        for j in self.steps_per_zone[zones[i]].tolist():
+            if trains[i] != trains[j]:
+                self.precs[i, j] = model.NewIntVar(
+                    0,
+                    1,
+                    f"prec_s{i}_s{j}")
+
+
+def _compute_diff_itineraries(self) -> None:
+    """Compute which pairs of steps of a same zone have different
+    itineraries, i.e. are followed by steps in different zones
+
+    The result is fully known from the steps so it is stored as constants:
+    self.diff_itineraries[zone][a, b] is 1 if the a-th and b-th steps of
+    the zone (in the order of self.steps_per_zone[zone]) have different
+    itineraries, and self.zone_positions[i] is the position of the step i
+    within its zone.
+    """
+    zones = self.steps.zone
+    nexts = self.steps.next
+    next_zones = np.where(nexts >= 0, zones[nexts], -1)
+
+    self.steps_per_zone = self.steps.steps_per_zone()
+
+    self.zone_positions = np.empty(len(self.steps), dtype=int)
+    self.diff_itineraries = {}
+    for zone, steps_of_zone in self.steps_per_zone.items():
+        self.zone_positions[steps_of_zone] = np.arange(len(steps_of_zone))
+        next_of_zone = next_zones[steps_of_zone]
+        has_next = next_of_zone >= 0
+        self.diff_itineraries[zone] = (
+            (next_of_zone[:, None] != next_of_zone[None, :])
+            & has_next[:, None]
+            & has_next[None, :]
+        ).astype(int)
+
+
+def _step_domains(self, tighten: bool = None) -> tuple[np.ndarray, ...]:
+    """Compute the domains of the time variables of each step
+
+    If current_time is set and the last solution has as many steps as
+    the current problem, the steps of the last solution that already
+    started (resp. ended) before current_time have their arrival
+    (resp. departure) time frozen. If fixed_times is set to a tuple
+    (indices, t_in, t_out), the times of these steps are fixed.
+
+    The domains are then tightened by _tighten_domains.
+
+    Parameters
+    ----------
+    tighten : bool, optional
+        tighten the domains, by default tight_domains
+
+    Returns
+    -------
+    tuple[np.ndarray, ...]
+        lower and upper bounds of t_in, t_out and durations
+    """
+    steps = self.steps
+    nb_steps = len(steps)
+    t_in_lb = steps.min_t_in.copy()
+    t_in_ub = np.full(nb_steps, cp_model.INT32_MAX, dtype=np.int64)
+    t_out_lb = steps.min_t_out.copy()
+    t_out_ub = np.full(nb_steps, cp_model.INT32_MAX, dtype=np.int64)
+    duration_lb = steps.min_duration.copy()
+    duration_ub = np.where(
+        steps.is_fixed, steps.min_duration, cp_model.INT32_MAX)
+
+    if (
+        self.current_time is not None
+        and self.last_solution is not None
+        and len(self.last_solution[0]) == nb_steps
+    ):
+        last_t_in, last_t_out = self.last_solution
+        started = last_t_in <= self.current_time
+        ended = last_t_out <= self.current_time
+        t_in_lb[started] = t_in_ub[started] = last_t_in[started]
+        t_out_lb[ended] = t_out_ub[ended] = last_t_out[ended]
+        duration_lb[ended] = duration_ub[ended] = (
+            last_t_out[ended] - last_t_in[ended])
+
+    if self.fixed_times is not None:
+        fixed, fixed_t_in, fixed_t_out = self.fixed_times
+        t_in_lb[fixed] = t_in_ub[fixed] = fixed_t_in
+        t_out_lb[fixed] = t_out_ub[fixed] = fixed_t_out
+        duration_lb[fixed] = duration_ub[fixed] = fixed_t_out - fixed_t_in
+
+    domains = t_in_lb, t_in_ub, t_out_lb, t_out_ub, duration_lb, duration_ub
+    if tighten if tighten is not None else self.tight_domains:
+        with self._phase("tighten_domains"):
+            return self._tighten_domains(domains)
+    return domains
+
+
+def _tighten_domains(
+        self,
+        domains: tuple[np.ndarray, ...]) -> tuple[np.ndarray, ...]:
+    """Tighten the domains of the time variables of each step
+
+    If the ponderations are nonnegative and the greedy heuristic finds
+    a solution, no step of an optimal solution arrives after its lower
+    bound by more than the weighted delay of this solution over the
+    lower bounds divided by its ponderation. The lower bounds are used
+    rather than the min arrival times as frozen steps may arrive before
+    their min arrival times. The last step of a train can always leave
+    as soon as possible. The bounds are then propagated along the
+    steps of each train until a fixed point.
+
+    Parameters
+    ----------
+    domains : tuple[np.ndarray, ...]
+        lower and upper bounds of t_in, t_out and durations
+
+    Returns
+    -------
+    tuple[np.ndarray, ...]
+        the tightened bounds
+    """
+    steps = self.steps
+    t_in_lb, t_in_ub, t_out_lb, t_out_ub, duration_lb, duration_ub = (
+        bound.copy() for bound in domains)
+    has_prev = np.flatnonzero(steps.prev >= 0)
+    prevs = steps.prev[has_prev]
+    overlaps = steps.overlap[has_prev]
+
+    weights = steps.ponderation
+    times = (
+        greedy_times(
+            steps, domains, self.itinierary_setup, self.allow_change_order)
+        if (weights >= 0).all() else None
+    )
+    if times is not None:
+        slack = ((times[0] - t_in_lb) * weights).sum()
+        positive = weights > 0
+        t_in_ub[positive] = np.minimum(
+            t_in_ub[positive],
+            t_in_lb[positive]
+            + np.floor(slack / weights[positive]).astype(np.int64)
+        )
+
+    last = np.ones(len(steps), dtype=bool)
+    last[prevs] = False
+    t_out_ub[last] = np.minimum(
+        t_out_ub[last],
+        np.maximum(t_out_lb[last], t_in_ub[last] + duration_lb[last]))
+
+    # at most one iteration per step of the longest train is needed
+    for _ in range(len(steps) + 1):
+        previous = np.concatenate(
+            (t_in_lb, t_in_ub, t_out_lb, t_out_ub, duration_lb, duration_ub))
+        t_in_lb[has_prev] = np.maximum(
+            t_in_lb[has_prev], t_out_lb[prevs] - overlaps)
+        t_in_lb = np.maximum(t_in_lb, t_out_lb - duration_ub)
+        t_out_lb = np.maximum(t_out_lb, t_in_lb + duration_lb)
+        np.maximum.at(t_out_lb, prevs, t_in_lb[has_prev] + overlaps)
+        np.minimum.at(t_out_ub, prevs, t_in_ub[has_prev] + overlaps)
+        t_in_ub[has_prev] = np.minimum(
+            t_in_ub[has_prev], t_out_ub[prevs] - overlaps)
+        t_in_ub = np.minimum(t_in_ub, t_out_ub - duration_lb)
+        t_out_ub = np.minimum(t_out_ub, t_in_ub + duration_ub)
+        duration_lb = np.maximum(duration_lb, t_out_lb - t_in_ub)
+        duration_ub = np.minimum(duration_ub, t_out_ub - t_in_lb)
+        if np.array_equal(previous, np.concatenate(
+            (t_in_lb, t_in_ub, t_out_lb, t_out_ub, duration_lb, duration_ub))
+        ):
+            break
+
+    return t_in_lb, t_in_ub, t_out_lb, t_out_ub, duration_lb, duration_ub
+
+
+def _update_domains(
+        self,
+        model: cp_model.CpModel) -> None:
+    """Update in place the domains of the time variables of a model
+    whose steps bounds changed, only the changed domains are written
+
+    Parameters
+    ----------
+    model : cp_model.CpModel
+        The model to update
+    """
+    domains = self._step_domains()
+    proto = model.Proto()
+    for variables, (lower, upper), (old_lower, old_upper) in zip(
+        (self.t_in, self.t_out, self.durations),
+        zip(domains[0::2], domains[1::2]),
+        zip(self.domains[0::2], self.domains[1::2])
+    ):
+        changed = np.flatnonzero((lower != old_lower) | (upper != old_upper))
+        for i in changed.tolist():
+            domain = proto.variables[variables[i].Index()].domain
+            domain.clear()
+            domain.extend([int(lower[i]), int(upper[i])])
+    self.domains = domains
@@ -0,0 +1,141 @@
+import asyncio
+import random
+import time
+
+import pytest
+from pyosrd.schedules import Schedule
+
+from cpagent.cp_agent import CpAgent
+
+
+def line_schedules(nb_zones, nb_trains, seed=0, delay=40, nb_lines=1):
+    """Generate trains running over sections of a line of zones, the first
+    train being delayed, on nb_lines independent copies of the line
+    """
+    ref_schedule = Schedule(nb_lines * nb_zones, nb_lines * nb_trains)
+    delayed_schedule = Schedule(nb_lines * nb_zones, nb_lines * nb_trains)
+    for line in range(nb_lines):
+        rng = random.Random(seed)
+        for train in range(nb_trains):
+            length = rng.randint(2, min(nb_zones, 5))
+            start = rng.randint(0, nb_zones - length)
+            t = train * 15 + rng.randint(0, 10)
+            train_delay = delay if train == 0 else 0
+            for zone in range(start, start + length):
+                duration = rng.randint(5, 20)
+                ref_schedule.set(
+                    line * nb_trains + train,
+                    line * nb_zones + zone,
+                    (t, t + duration))
+                delayed_schedule.set(
+                    line * nb_trains + train,
+                    line * nb_zones + zone,
+                    (t + train_delay, t + duration + train_delay))
+                t += duration - rng.randint(0, 2)
+    return ref_schedule, delayed_schedule
+
+
+def test_solve_async(schedule_straight_line_2t):
+    """Test that concurrent requests get the results of synchronous solves
+    without changing the state of the agent
+    """
+    ref_schedule, delayed_schedule, fixed_steps, weights = (
+        schedule_straight_line_2t)
+    agent = CpAgent("async_agent")
+    agent.max_concurrent_solves = 2
+
+    async def regulate():
+        return await asyncio.gather(*(
+            agent.solve_async(ref_schedule, delayed, fixed_steps, weights)
+            for delayed in (delayed_schedule, ref_schedule, delayed_schedule)
+        ))
+
+    regulated = asyncio.run(regulate())
+
+    for schedule, delayed in zip(
+        regulated, (delayed_schedule, ref_schedule, delayed_schedule)
+    ):
+        assert schedule.df.equals(CpAgent("sync_agent")._solve(
+            ref_schedule, delayed, fixed_steps, weights).df)
+    assert agent.status is None
+
+
+def test_solve_async_loops(schedule_straight_line_2t):
+    """Test that an agent can be used from successive event loops, with
+    the concurrency limit of the time of each request
+    """
+    ref_schedule, delayed_schedule, fixed_steps, weights = (
+        schedule_straight_line_2t)
+    agent = CpAgent("async_agent")
+
+    async def regulate():
+        schedule = await agent.solve_async(
+            ref_schedule, delayed_schedule, fixed_steps, weights)
+        limit, _ = agent.solve_semaphores[asyncio.get_running_loop()]
+        return schedule, limit
+
+    for max_concurrent_solves in (1, 2):
+        agent.max_concurrent_solves = max_concurrent_solves
+        schedule, limit = asyncio.run(regulate())
+        assert schedule is not None
+        assert limit == max_concurrent_solves
+
+
+@pytest.mark.parametrize("mode", [None, "decompose", "rolling_horizon"])
+def test_solve_async_cancel(mode):
+    """Test that cancelling a request stops its search, including the
+    searches of its sub problems
+    """
+    # two independent lines, solved in two processes by decompose
+    ref_schedule, delayed_schedule = line_schedules(
+        40, 60, seed=8, nb_lines=2 if mode == "decompose" else 1)
+    agent = CpAgent("async_agent")
+    agent.tight_domains = False
+    agent.max_optimization_time = 60
+    # a single window solved by a copy of the agent
+    agent.window_length = 10000
+    if mode is not None:
+        setattr(agent, mode, True)
+
+    async def cancel():
+        task = asyncio.create_task(
+            agent.solve_async(ref_schedule, delayed_schedule))
+        await asyncio.sleep(.5)
+        task.cancel()
+        await task
+
+    start = time.perf_counter()
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(cancel())
+    assert time.perf_counter() - start < 10
+
+
+def test_stop_search_before_solve():
+    """Test that a stop requested before the search starts is applied,
+    both on a copy solving a request and while the model is built
+    """
+    ref_schedule, delayed_schedule = line_schedules(40, 60, seed=8)
+    agent = CpAgent("async_agent")
+    agent.tight_domains = False
+    agent.max_optimization_time = 60
+
+    # a copy gets its stop requests before its solve is started
+    copy_agent = agent._sub_agent()
+    copy_agent.stop_search()
+    start = time.perf_counter()
+    copy_agent._solve(ref_schedule, delayed_schedule)
+    assert time.perf_counter() - start < 10
+
+    # stopped from the thread of the solve, before the search starts
+    build_model = agent._build_model
+
+    def build_and_stop():
+        model = build_model()
+        agent.stop_search()
+        return model
+
+    agent._build_model = build_and_stop
+    start = time.perf_counter()
+    agent._solve(ref_schedule, delayed_schedule)
+    assert time.perf_counter() - start < 10
+    assert agent.search_stop is None
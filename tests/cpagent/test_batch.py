@@ -0,0 +1,73 @@
+import pytest
+
+from cpagent.cp_agent import (
+    CpAgent,
+    OptimisationStatus,
+)
+
+
+@pytest.mark.parametrize("materialize", [False, True])
+def test_regulate_batch(schedule_straight_line_2t, materialize):
+    """Test that each scenario of a batch gets the result of its own solve
+    """
+    ref_schedule, delayed_schedule, fixed_steps, weights = (
+        schedule_straight_line_2t)
+
+    agent = CpAgent("batch_agent")
+    agent.max_workers = 2
+    results = {
+        result.key: result
+        for result in agent.regulate_batch(
+            {"delayed": delayed_schedule, "on_time": ref_schedule},
+            ref_schedule,
+            fixed_steps,
+            weights,
+            materialize=materialize,
+            max_pending=1
+        )
+    }
+
+    assert set(results) == {"delayed", "on_time"}
+    for key, delayed in (
+        ("delayed", delayed_schedule), ("on_time", ref_schedule)
+    ):
+        result = results[key]
+        assert result.error is None
+        assert result.status == OptimisationStatus.OPTIMAL
+
+        single_agent = CpAgent("single_agent")
+        regulated = single_agent._solve(
+            ref_schedule, delayed, fixed_steps, weights)
+        assert result.t_in.tolist() == single_agent.last_solution[0].tolist()
+        assert result.objective == single_agent._objective_value(result.t_in)
+        if materialize:
+            assert result.schedule.df.equals(regulated.df)
+        else:
+            assert result.schedule is None
+
+
+def test_regulate_batch_malformed_scenario(schedule_straight_line_2t):
+    """Test that a scenario failing to be converted gets a FAILED result
+    without dropping the next scenarios
+    """
+    ref_schedule, delayed_schedule, fixed_steps, weights = (
+        schedule_straight_line_2t)
+
+    agent = CpAgent("batch_agent")
+    agent.max_workers = 1
+    results = {
+        result.key: result
+        for result in agent.regulate_batch(
+            {"malformed": None, "delayed": delayed_schedule},
+            ref_schedule,
+            fixed_steps,
+            weights,
+            max_pending=1
+        )
+    }
+
+    assert set(results) == {"malformed", "delayed"}
+    assert results["malformed"].status == OptimisationStatus.FAILED
+    assert results["malformed"].error is not None
+    assert results["delayed"].error is None
+    assert results["delayed"].status == OptimisationStatus.OPTIMAL
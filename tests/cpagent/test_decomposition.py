@@ -0,0 +1,61 @@
+from copy import deepcopy
+
+import pytest
+
+from cpagent.cp_agent import (
+    CpAgent,
+    OptimisationStatus,
+)
+from cpagent.decomposition import conflict_components
+from cpagent.step_table import StepTable
+from .test_utils import check_solution_validity, CpRegulationSolution
+
+
+@pytest.fixture
+def use_case_two_lines(use_case_cp_4_zones_switch):
+    """Two copies of use_case_cp_4_zones_switch on distinct zones
+    and trains
+    """
+    nb_zones, nb_trains, steps = use_case_cp_4_zones_switch
+    steps = deepcopy(steps)
+    shift = len(steps)
+    for step in deepcopy(steps):
+        step["idx"] += shift
+        step["train"] += nb_trains
+        step["zone"] += nb_zones
+        if step["prev"] != -1:
+            step["prev"] += shift
+        steps.append(step)
+    return 2 * nb_zones, 2 * nb_trains, steps
+
+
+def test_conflict_components(use_case_two_lines):
+    """Test that trains sharing no zone are in different components
+    """
+    components = conflict_components(
+        StepTable.from_steps(use_case_two_lines[2]))
+
+    assert [component.tolist() for component in components] == [
+        [0, 1, 2, 3, 4, 5],
+        [6, 7, 8, 9, 10, 11]
+    ]
+
+
+def test_solve_components(use_case_two_lines):
+    """Test that solving the components separately gives the same
+    objective as the monolithic problem
+    """
+    nb_zones, nb_trains, steps = use_case_two_lines
+    agent = CpAgent("decomposed")
+    agent.max_workers = 2
+    status, t_in, t_out = agent._solve_components(
+        nb_zones, nb_trains, StepTable.from_steps(steps))
+
+    cp_solver, _ = CpAgent("monolithic")._solve_from_steps(
+        nb_zones, nb_trains, steps)
+
+    assert status == OptimisationStatus.OPTIMAL
+    assert agent._objective_value(t_in) == cp_solver.ObjectiveValue()
+    assert check_solution_validity(CpRegulationSolution(
+        nb_zones, nb_trains, steps, agent._objective_value(t_in),
+        t_in.tolist(), t_out.tolist()))
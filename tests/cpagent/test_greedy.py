@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+from cpagent.cp_agent import (
+    CpAgent,
+    OptimisationStatus,
+)
+from cpagent.schedule_adapters import build_step
+from cpagent.step_table import StepTable
+from .test_utils import (
+    CpRegulationSolution,
+    check_spacing,
+    check_chaining,
+    check_min_t_in,
+    check_min_t_out,
+    check_min_duration,
+    check_fixed_duration,
+)
+
+
+@pytest.mark.parametrize("allow_change_order", [True, False])
+@pytest.mark.parametrize("use_case", [
+    "use_case_cp_4_zones_switch",
+    "use_case_straight_line_2t",
+    "use_case_empty_zone",
+])
+def test_greedy_feasible(use_case, allow_change_order, request):
+    """Test that the greedy heuristic respects the constraints
+    of the problem
+    """
+    nb_zones, nb_trains, steps = request.getfixturevalue(use_case)
+    solver = CpAgent("greedy")
+    solver.allow_change_order = allow_change_order
+    status, t_in, t_out = solver._solve_greedy(
+        nb_zones, nb_trains, StepTable.from_steps(steps))
+
+    assert status == OptimisationStatus.HEURISTIC
+    solution = CpRegulationSolution(
+        nb_zones, nb_trains, steps, 0, t_in.tolist(), t_out.tolist())
+    for check in (
+        check_spacing,
+        check_chaining,
+        check_min_t_in,
+        check_min_t_out,
+        check_min_duration,
+        check_fixed_duration,
+    ):
+        assert check(solution)
+
+
+def test_greedy_infeasible(use_case_infeasible):
+    """Test that the greedy heuristic fails on an infeasible problem
+    """
+    nb_zones, nb_trains, steps = use_case_infeasible
+    status, t_in, t_out = CpAgent("greedy")._solve_greedy(
+        nb_zones, nb_trains, StepTable.from_steps(steps))
+
+    assert status == OptimisationStatus.FAILED
+    assert t_in is None and t_out is None
+
+
+def test_greedy_engine(schedule_straight_line_2t):
+    """Test that the greedy engine regulates the schedule
+    """
+    solver = CpAgent("greedy")
+    solver.engine = "greedy"
+    regulated = solver._solve(*schedule_straight_line_2t)
+
+    assert regulated is not schedule_straight_line_2t[1]
+    assert solver.last_solution[0].tolist() == [0, 10, 10, 30]
+
+
+def test_greedy_fallback(schedule_straight_line_2t):
+    """Test that the greedy heuristic is used when the cp solve fails
+    """
+    solver = CpAgent("ortools")
+    solver.max_optimization_time = 0
+    assert solver._solve(*schedule_straight_line_2t) is (
+        schedule_straight_line_2t[1])
+
+    solver.greedy_fallback = True
+    regulated = solver._solve(*schedule_straight_line_2t)
+    assert regulated is not schedule_straight_line_2t[1]
+    assert "greedy_fallback" in solver.solve_report["phases"]
+
+
+def _zone_revisit_steps():
+    """Steps of a train leaving the zone 0 and coming back into it, its
+    next step overlapping the previous one, and of a train passing in
+    the zone 0 between them
+    """
+    return [
+        build_step(0, "a", 0, -1, 0, 10, 10, False, next=1),
+        build_step(1, "a", 1, 0, 5, 7, 2, False, overlap=5, next=2),
+        build_step(2, "a", 0, 1, 2, 7, 5, False, overlap=5),
+        build_step(3, "b", 0, -1, 10, 11, 1, False),
+    ]
+
+
+def test_greedy_zone_revisit():
+    """Test that a train coming back into a zone does not overlap its
+    previous step in the zone
+    """
+    steps = _zone_revisit_steps()
+    solver = CpAgent("greedy")
+    solver.fixed_times = (np.array([3]), np.array([10]), np.array([11]))
+    status, t_in, t_out = solver._solve_greedy(
+        2, 2, StepTable.from_steps(steps))
+
+    assert status == OptimisationStatus.HEURISTIC
+    assert t_in.tolist() == [0, 5, 11, 10]
+    assert t_out.tolist() == [10, 16, 16, 11]
+    solution = CpRegulationSolution(
+        2, 2, steps, 0, t_in.tolist(), t_out.tolist())
+    assert check_spacing(solution)
+
+
+def test_greedy_zone_revisit_consecutive():
+    """Test that the greedy heuristic fails rather than returning two
+    consecutive steps of a train in a zone, which the model forbids
+    """
+    status, t_in, t_out = CpAgent("greedy")._solve_greedy(
+        2, 2, StepTable.from_steps(_zone_revisit_steps()))
+
+    assert status == OptimisationStatus.FAILED
+    assert t_in is None and t_out is None
@@ -0,0 +1,57 @@
+import pytest
+
+from cpagent.cp_agent import CpAgent
+from cpagent.history import SolveHistory
+
+
+def test_solve_history_ring_buffer():
+    """Test that the history keeps the most recent records in order
+    """
+    history = SolveHistory(3)
+    assert list(history) == []
+    for i in range(5):
+        history.record(i, 10 - i, 0)
+
+    assert len(history) == 3
+    assert history.dropped == 2
+    assert list(history) == [(2, 8, 0), (3, 7, 0), (4, 6, 0)]
+    assert history[-1] == (4, 6, 0)
+
+    exported = history.export("instance")
+    assert exported["instance_id"] == "instance"
+    assert exported["objective"].tolist() == [8, 7, 6]
+    assert exported["dropped"] == 2
+
+
+def test_solve_history_capacity():
+    """Test that an empty history is rejected
+    """
+    with pytest.raises(ValueError):
+        SolveHistory(0)
+
+
+def test_save_history(use_case_delay_conv):
+    """Test that the solutions of a solve are recorded
+    """
+    agent = CpAgent("history_agent")
+    agent.save_history = True
+    agent.history_capacity = 1
+    cp_solver, _ = agent._solve_from_steps(*use_case_delay_conv)
+
+    assert len(agent.history) == 1
+    assert agent.history[-1][1] == cp_solver.ObjectiveValue()
+
+
+def test_regulate_batch_history(schedule_straight_line_2t):
+    """Test that the history of each scenario is exported with its key
+    """
+    ref_schedule, delayed_schedule, fixed_steps, weights = (
+        schedule_straight_line_2t)
+    agent = CpAgent("batch_agent")
+    agent.max_workers = 1
+    agent.save_history = True
+    result, = agent.regulate_batch(
+        {"delayed": delayed_schedule}, ref_schedule, fixed_steps, weights)
+
+    assert result.history["instance_id"] == "delayed"
+    assert result.history["objective"][-1] == result.objective
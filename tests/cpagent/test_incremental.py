@@ -0,0 +1,85 @@
+from copy import deepcopy
+
+from cpagent.cp_agent import CpAgent
+from .test_utils import check_solution_validity, build_solution
+
+
+def delay_step(steps, idx, delay):
+    """Delay the departure of a step and the following steps of its train
+    """
+    steps = deepcopy(steps)
+    steps[idx]["min_t_out"] += delay
+    steps[idx]["min_duration"] += delay
+    step = steps[idx]
+    while step["next"] != -1:
+        step = steps[step["next"]]
+        step["min_t_in"] += delay
+        step["min_t_out"] += delay
+    return steps
+
+
+def leave_asap(steps, t_in, t_out):
+    """Check that the last step of each train leaves as soon as possible
+    """
+    prevs = {step["prev"] for step in steps}
+    return all(
+        t_out[i] == max(t_in[i] + step["min_duration"], step["min_t_out"])
+        for i, step in enumerate(steps)
+        if i not in prevs
+    )
+
+
+def test_incremental_reuses_model(use_case_delay_conv):
+    """Test that the model is kept between two solves of problems
+    with the same structure and gives the same result as a full solve
+    """
+    nb_zones, nb_trains, steps = use_case_delay_conv
+    steps = [dict(step, next=-1) for step in steps]
+    for step in steps:
+        if step["prev"] != -1:
+            steps[step["prev"]]["next"] = step["idx"]
+
+    agent = CpAgent("incremental")
+    agent.incremental = True
+    agent._solve_from_steps(nb_zones, nb_trains, steps)
+    model = agent.model
+
+    delayed_steps = delay_step(steps, 0, 15)
+    cp_solver, _ = agent._solve_from_steps(nb_zones, nb_trains, delayed_steps)
+    assert agent.model is model
+    assert check_solution_validity(build_solution(agent, cp_solver))
+
+    oracle = CpAgent("full")
+    oracle_solver, _ = oracle._solve_from_steps(
+        nb_zones, nb_trains, delayed_steps)
+    assert cp_solver.ObjectiveValue() == oracle_solver.ObjectiveValue()
+    # the bounds of the last steps are updated with the delays
+    for agent_solver, solver in ((agent, cp_solver), (oracle, oracle_solver)):
+        assert leave_asap(
+            delayed_steps,
+            solver.Values(agent_solver.t_in).to_list(),
+            solver.Values(agent_solver.t_out).to_list())
+
+
+def test_incremental_freezes_past_steps(use_case_delay_conv):
+    """Test that steps of the last solution started before the current
+    time are frozen
+    """
+    nb_zones, nb_trains, steps = use_case_delay_conv
+
+    agent = CpAgent("incremental")
+    agent.incremental = True
+    agent._solve_from_steps(nb_zones, nb_trains, steps)
+    last_t_in, last_t_out = agent.last_solution
+
+    agent.current_time = 20
+    cp_solver, _ = agent._solve_from_steps(
+        nb_zones, nb_trains, delay_step(steps, 5, 30))
+
+    t_in = cp_solver.Values(agent.t_in).to_list()
+    t_out = cp_solver.Values(agent.t_out).to_list()
+    for i in range(len(steps)):
+        if last_t_in[i] <= 20:
+            assert t_in[i] == last_t_in[i]
+        if last_t_out[i] <= 20:
+            assert t_out[i] == last_t_out[i]
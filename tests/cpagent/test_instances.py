@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from cpagent.cp_agent import CpAgent
+from cpagent.instances import InstanceCorpus, read_instance, write_instance
+from cpagent.step_table import StepTable
+
+
+def test_save_load_instance(use_case_delay_conv, tmp_path):
+    """Test that a saved problem is solved as the original one with the
+    settings of the agent that saved it
+    """
+    agent = CpAgent("saving_agent")
+    agent.itinierary_setup = 30
+    agent.allow_change_order = False
+    cp_solver, _ = agent._solve_from_steps(*use_case_delay_conv)
+    agent.save_instance(tmp_path / "delay_conv", origin="test")
+
+    loading_agent = CpAgent("loading_agent")
+    nb_zones, nb_trains, steps = loading_agent.load_instance(
+        tmp_path / "delay_conv.npy")
+    assert loading_agent.itinierary_setup == 30
+    assert not loading_agent.allow_change_order
+    assert (nb_zones, nb_trains) == use_case_delay_conv[:2]
+    assert steps.to_steps() == agent.steps.to_steps()
+
+    loaded_solver, _ = loading_agent._solve_from_steps(
+        nb_zones, nb_trains, steps)
+    assert loaded_solver.ObjectiveValue() == cp_solver.ObjectiveValue()
+    assert read_instance(tmp_path / "delay_conv").metadata == {
+        "origin": "test"}
+
+
+def test_save_instance_before_solve(tmp_path):
+    """Test that an agent without problem can not save it
+    """
+    with pytest.raises(ValueError):
+        CpAgent("agent").save_instance(tmp_path / "empty")
+
+
+def test_instance_corpus(use_case_straight_line_2t, tmp_path):
+    """Test that a corpus lists its problems by name and memory-maps
+    their steps
+    """
+    nb_zones, nb_trains, steps = use_case_straight_line_2t
+    steps = StepTable.from_steps(steps)
+    for name in ("b", "a"):
+        write_instance(tmp_path / name, nb_zones, nb_trains, steps)
+
+    corpus = InstanceCorpus(tmp_path)
+    assert len(corpus) == 2
+    assert [instance.name for instance in corpus] == ["a", "b"]
+    instance = corpus["b"]
+    assert instance.problem[:2] == (nb_zones, nb_trains)
+    assert isinstance(instance.steps.min_t_in.base, np.memmap)
+    assert instance.steps.to_steps() == steps.to_steps()
@@ -4,11 +4,13 @@ import pandas as pd
 from pandas.testing import assert_frame_equal
 
 from pyosrd.osrd import OSRD
-from pyosrd.schedules import schedule_from_osrd
+from pyosrd.schedules import Schedule, schedule_from_osrd
 
+from cpagent import schedule_adapters
 from cpagent.schedule_adapters import (
     build_step,
     steps_from_schedule,
+    step_table_from_schedule,
     schedule_from_solution,
     OptimisationStatus,
 )
@@ -57,6 +59,42 @@ def test_regulation_problem_from_osrd(osrd_point_switch):
     assert oracle_steps == steps
 
 
+def test_step_table_path_order():
+    """Testing that the steps of a train follow its path, sorted by
+    start time rather than by zone
+    """
+    ref_schedule = Schedule(3, 2)
+    ref_schedule.set(0, 2, (0, 10))
+    ref_schedule.set(0, 0, (10, 20))
+    ref_schedule.set(1, 1, (5, 15))
+    ref_schedule.set(1, 2, (15, 25))
+
+    steps = step_table_from_schedule(ref_schedule, ref_schedule)
+
+    assert steps.zone.tolist() == [
+        ref_schedule.zones.index(zone)
+        for train in ref_schedule.trains
+        for zone in ref_schedule.path(train)
+    ]
+    assert steps.zone.tolist() == [2, 0, 1, 2]
+    assert steps.train.tolist() == [0, 0, 1, 1]
+
+
+def test_steps_from_schedule_missing_zone(schedule_straight_line_2t):
+    """Testing that the steps of zones missing from the fixed durations
+    and the weights get the default values
+    """
+    ref_schedule, delayed_schedule, _, _ = schedule_straight_line_2t
+    fixed_durations = pd.DataFrame([[True, True]], [0])
+    weights = pd.DataFrame([[3, 3]], [0])
+
+    steps = steps_from_schedule(
+        ref_schedule, delayed_schedule, fixed_durations, weights)
+
+    assert [step["is_fixed"] for step in steps] == [True, False, True, False]
+    assert [step["ponderation"] for step in steps] == [3, 1, 3, 1]
+
+
 def test_schedule_from_solution(schedule_straight_line_2t):
     steps = steps_from_schedule(*schedule_straight_line_2t)
 
@@ -76,3 +114,58 @@ def test_schedule_from_solution(schedule_straight_line_2t):
 
     assert_frame_equal(regulated_schedule.df, oracle_regulated.df)
 
+
+def test_schedule_from_solution_step_table(schedule_straight_line_2t):
+    steps = step_table_from_schedule(*schedule_straight_line_2t)
+
+    ref_schedule = deepcopy(schedule_straight_line_2t[0])
+    ref_df = ref_schedule.df.copy()
+    ref_schedule.cache = {}
+
+    regulated_schedule = schedule_from_solution(
+        ref_schedule,
+        OptimisationStatus.OPTIMAL,
+        steps,
+        [0, 10, 10, 30],
+        [10, 30, 30, 40]
+    )
+
+    oracle_regulated = deepcopy(schedule_straight_line_2t[1])
+    oracle_regulated.set(1, 0, [10, 30])
+    oracle_regulated.set(1, 1, [30, 40])
+
+    assert_frame_equal(regulated_schedule.df, oracle_regulated.df)
+    assert_frame_equal(ref_schedule.df, ref_df)
+    # nothing is shared with the reference schedule
+    assert regulated_schedule.cache is not ref_schedule.cache
+    regulated_schedule.set(0, 0, [1, 2])
+    assert_frame_equal(ref_schedule.df, ref_df)
+
+
+def test_schedule_from_solution_fallback(schedule_straight_line_2t,
+                                         monkeypatch):
+    """Testing that a schedule whose frame can not be written in bulk is
+    written cell by cell
+    """
+    monkeypatch.setattr(
+        schedule_adapters, "SCHEDULE_FRAME_ATTRIBUTE", "_missing_frame")
+    steps = step_table_from_schedule(*schedule_straight_line_2t)
+
+    ref_schedule = deepcopy(schedule_straight_line_2t[0])
+    ref_df = ref_schedule.df.copy()
+
+    regulated_schedule = schedule_from_solution(
+        ref_schedule,
+        OptimisationStatus.OPTIMAL,
+        steps,
+        [0, 10, 10, 30],
+        [10, 30, 30, 40]
+    )
+
+    oracle_regulated = deepcopy(schedule_straight_line_2t[1])
+    oracle_regulated.set(1, 0, [10, 30])
+    oracle_regulated.set(1, 1, [30, 40])
+
+    assert regulated_schedule is not ref_schedule
+    assert_frame_equal(regulated_schedule.df, oracle_regulated.df)
+    assert_frame_equal(ref_schedule.df, ref_df)
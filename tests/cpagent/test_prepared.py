@@ -0,0 +1,86 @@
+from pyosrd.schedules import Schedule
+
+from cpagent.cp_agent import (
+    CpAgent,
+    OptimisationStatus,
+)
+from .test_utils import CpRegulationSolution, check_solution_validity
+
+
+def test_prepared_timetable(schedule_straight_line_2t):
+    """Test that a prepared timetable reuses the model of its reference
+    schedule and finds the optimal solutions of a fresh agent
+    """
+    ref_schedule, delayed_schedule, fixed_steps, weights = (
+        schedule_straight_line_2t)
+
+    agent = CpAgent("prepared_agent")
+    prepared = agent.prepare_timetable(ref_schedule, fixed_steps, weights)
+    assert len(prepared.agents) == 1
+
+    for delayed in (delayed_schedule, ref_schedule, delayed_schedule):
+        prepared.regulate(delayed)
+        assert prepared.status == OptimisationStatus.OPTIMAL
+        assert "update_model" in prepared.solve_report["phases"]
+        assert "create_variables" not in prepared.solve_report["phases"]
+        prepared_agent, = prepared.agents.values()
+        t_in, t_out = prepared_agent.last_solution
+        objective = prepared.solve_report["solver"]["objective"]
+        assert check_solution_validity(CpRegulationSolution(
+            prepared_agent.nb_zones,
+            prepared_agent.nb_trains,
+            prepared_agent.steps,
+            int(objective),
+            t_in.tolist(),
+            t_out.tolist()
+        ))
+
+        single_agent = CpAgent("single_agent")
+        single_agent._solve(ref_schedule, delayed, fixed_steps, weights)
+        assert objective == single_agent.solve_report["solver"]["objective"]
+        assert (t_in == single_agent.last_solution[0]).all()
+    assert len(prepared.agents) == 1
+    assert agent.model is None
+
+
+def test_prepared_timetable_max_models(schedule_straight_line_2t):
+    """Test that a delayed schedule changing the order of the trains gets
+    its own model and that the least recently used models are dropped
+    """
+    ref_schedule, _, fixed_steps, weights = schedule_straight_line_2t
+    delayed_schedule = Schedule(2, 2)
+    delayed_schedule.set(0, 0, (15, 25))
+    delayed_schedule.set(0, 1, (25, 35))
+    delayed_schedule.set(1, 0, (10, 20))
+    delayed_schedule.set(1, 1, (20, 30))
+
+    agent = CpAgent("prepared_agent")
+    agent.allow_change_order = False
+    prepared = agent.prepare_timetable(
+        ref_schedule, fixed_steps, weights, max_models=1)
+    reference_agent, = prepared.agents.values()
+    prepared.regulate(delayed_schedule)
+
+    delayed_agent, = prepared.agents.values()
+    assert delayed_agent is not reference_agent
+    assert prepared.status == OptimisationStatus.OPTIMAL
+    assert "create_variables" in prepared.solve_report["phases"]
+
+
+def test_prepared_timetable_plain_cp(schedule_straight_line_2t):
+    """Test that the settings of the agent solving without a model do not
+    bypass the prepared models
+    """
+    ref_schedule, delayed_schedule, fixed_steps, weights = (
+        schedule_straight_line_2t)
+
+    agent = CpAgent("prepared_agent")
+    agent.decompose = True
+    agent.parameter_portfolio = [{"num_workers": 1}]
+    agent.engine = "greedy"
+    prepared = agent.prepare_timetable(ref_schedule, fixed_steps, weights)
+    prepared.regulate(delayed_schedule)
+
+    assert prepared.status == OptimisationStatus.OPTIMAL
+    assert "update_model" in prepared.solve_report["phases"]
+    assert agent.engine == "greedy"
@@ -0,0 +1,169 @@
+import pytest
+
+from cpagent.cp_agent import (
+    CpAgent,
+    OptimisationStatus,
+)
+from cpagent.schedule_adapters import build_step
+from cpagent.step_table import StepTable
+from .test_utils import (
+    check_solution_validity,
+    check_spacing,
+    check_chaining,
+    check_min_t_in,
+    check_min_duration,
+    check_objective_value,
+    CpRegulationSolution
+)
+
+
+@pytest.mark.parametrize("use_case", [
+    "use_case_cp_4_zones_switch",
+    "use_case_straight_line_2t",
+    "use_case_empty_zone"
+])
+def test_rolling_horizon(use_case, request):
+    """Test that the rolling horizon decomposition gives a valid
+    solution and reports its distance to the monolithic objective
+    """
+    nb_zones, nb_trains, steps = request.getfixturevalue(use_case)
+    agent = CpAgent("rolling")
+    agent.window_length = 20
+    agent.window_overlap = 10
+    agent.rolling_horizon_compare = True
+
+    status, t_in, t_out = agent._solve_rolling_horizon(
+        nb_zones, nb_trains, StepTable.from_steps(steps))
+
+    assert status == OptimisationStatus.SUBOPTIMAL
+    report = agent.rolling_horizon_report
+    assert report["windows"] > 1
+    assert report["gap"] == (
+        report["objective"] - report["monolithic_objective"])
+    assert report["gap"] >= 0
+    assert check_solution_validity(CpRegulationSolution(
+        nb_zones, nb_trains, steps, report["objective"],
+        t_in.tolist(), t_out.tolist()))
+
+
+def chained_steps(paths: list[list[tuple[int, int, int]]]) -> list[dict]:
+    """Build the steps of trains running over (zone, min_t_in, duration)
+    """
+    steps = []
+    for train, path in enumerate(paths):
+        first = len(steps)
+        for position, (zone, min_t_in, duration) in enumerate(path):
+            idx = first + position
+            steps.append(build_step(
+                idx, train, zone, idx - 1 if position else -1,
+                min_t_in, min_t_in + duration, duration, False,
+                next=idx + 1 if position + 1 < len(path) else -1))
+    return steps
+
+
+@pytest.mark.parametrize("paths,window_length,window_overlap,setup", [
+    # a step of zone 0 must not be committed after an uncommitted one
+    (
+        [
+            [(2, 49, 19), (0, 68, 8), (1, 76, 9)],
+            [(0, 0, 15)],
+            [(0, 56, 5), (1, 61, 16)],
+            [(0, 45, 19), (2, 64, 18)],
+        ],
+        30, 10, 0
+    ),
+    # the arrival of the next step of a committed step is fixed too
+    (
+        [
+            [(0, 25, 6), (1, 31, 15)],
+            [(3, 25, 18), (2, 43, 9)],
+            [(2, 11, 11), (1, 22, 10), (3, 32, 19), (0, 51, 7)],
+            [(2, 12, 10)],
+            [(0, 37, 8)],
+            [(1, 29, 9)],
+            [(3, 8, 14), (2, 22, 17)],
+        ],
+        40, 10, 10
+    ),
+    # trains crossing after the window, the last commits are released
+    (
+        [
+            [(0, 35, 19)],
+            [(0, 48, 17), (3, 65, 13), (2, 78, 14), (1, 92, 6)],
+            [(0, 52, 11), (1, 63, 19), (2, 82, 16), (3, 98, 11)],
+            [(2, 39, 13), (0, 52, 6), (1, 58, 14)],
+        ],
+        30, 15, 5
+    ),
+])
+def test_rolling_horizon_feasible(
+    paths, window_length, window_overlap, setup
+):
+    """Test that the rolling horizon decomposition solves problems
+    that the monolithic model solves
+    """
+    steps = chained_steps(paths)
+    nb_zones = max(step["zone"] for step in steps) + 1
+    agent = CpAgent("rolling")
+    agent.window_length = window_length
+    agent.window_overlap = window_overlap
+    agent.itinierary_setup = setup
+    agent.rolling_horizon_compare = True
+
+    status, t_in, t_out = agent._solve_rolling_horizon(
+        nb_zones, len(paths), StepTable.from_steps(steps))
+
+    assert status == OptimisationStatus.SUBOPTIMAL
+    assert agent.rolling_horizon_report["gap"] >= 0
+    # the first steps of the trains may be delayed
+    solution = CpRegulationSolution(
+        nb_zones, len(paths), steps, agent.rolling_horizon_report["objective"],
+        t_in.tolist(), t_out.tolist())
+    assert check_spacing(solution)
+    assert check_chaining(solution)
+    assert check_min_t_in(solution)
+    assert check_min_duration(solution)
+    assert check_objective_value(solution)
+
+
+@pytest.mark.parametrize("use_case", [
+    "use_case_cp_4_zones_switch",
+    "use_case_straight_line_2t",
+])
+def test_rolling_horizon_window_time_limit(use_case, request):
+    """Test that the windows whose search finds no solution within their
+    time limit are solved by the greedy heuristic
+    """
+    nb_zones, nb_trains, steps = request.getfixturevalue(use_case)
+    agent = CpAgent("rolling")
+    agent.window_length = 20
+    agent.window_overlap = 10
+    # no time to search, CP-SAT returns UNKNOWN
+    agent.window_time_limit = 0
+
+    status, t_in, t_out = agent._solve_rolling_horizon(
+        nb_zones, nb_trains, StepTable.from_steps(steps))
+
+    assert status == OptimisationStatus.SUBOPTIMAL
+    report = agent.rolling_horizon_report
+    assert report["greedy_windows"] > 0
+    solution = CpRegulationSolution(
+        nb_zones, nb_trains, steps, report["objective"],
+        t_in.tolist(), t_out.tolist())
+    assert check_spacing(solution)
+    assert check_chaining(solution)
+    assert check_min_t_in(solution)
+    assert check_min_duration(solution)
+
+
+def test_rolling_horizon_invalid_windows(use_case_delay_conv):
+    """Test that the overlap must be lower than the window length
+    """
+    agent = CpAgent("rolling")
+    agent.window_length = 10
+    agent.window_overlap = 10
+    with pytest.raises(ValueError):
+        agent._solve_rolling_horizon(
+            use_case_delay_conv[0],
+            use_case_delay_conv[1],
+            StepTable.from_steps(use_case_delay_conv[2]))
@@ -1,10 +1,16 @@
+import numpy as np
 import pytest
 
+from ortools.sat.python import cp_model
+
 from cpagent.cp_agent import (
     CpAgent,
     OptimisationStatus,
 
 )
+from cpagent.parallel import _time_limit, _worker_parameters
+from cpagent.schedule_adapters import build_step
+from cpagent.step_table import StepTable
 from .test_utils import check_solution_validity, build_solution
 
 
@@ -76,3 +82,331 @@ def test_solver_empty_zone(solver, use_case_empty_zone):
         solver,
         cp_solver
     ))
+
+
+@pytest.mark.parametrize("solver", [
+    CpAgent("ortools")
+])
+def test_solver_sparse_precedences(solver, use_case_delay_conv):
+    """Test that precedence variables are only created for steps
+    of different trains sharing the same zone
+    """
+    solver._solve_from_steps(
+        use_case_delay_conv[0],
+        use_case_delay_conv[1],
+        use_case_delay_conv[2],
+    )
+    steps = use_case_delay_conv[2]
+    pairs_oracle = {
+        (i, j)
+        for i, step_i in enumerate(steps)
+        for j, step_j in enumerate(steps)
+        if step_i["zone"] == step_j["zone"]
+        and step_i["train"] != step_j["train"]
+    }
+    assert set(solver.precs) == pairs_oracle
+
+
+@pytest.mark.parametrize("solver", [
+    CpAgent("ortools")
+])
+def test_solver_diff_itineraries(solver):
+    """Test that itinerary divergence is computed as constants
+    from the zones of the next steps
+    """
+    solver.steps = StepTable.from_steps([
+        build_step(0, 0, 0, -1, 0, 10, 10, False, next=1),
+        build_step(1, 0, 1, 0, 10, 20, 10, False),
+        build_step(2, 1, 0, -1, 10, 20, 10, False, next=3),
+        build_step(3, 1, 2, 2, 20, 30, 10, False),
+        build_step(4, 2, 0, -1, 20, 30, 10, False, next=5),
+        build_step(5, 2, 1, 4, 30, 40, 10, False),
+    ])
+    solver._compute_diff_itineraries()
+
+    assert solver.steps_per_zone[0].tolist() == [0, 2, 4]
+    assert solver.diff_itineraries[0].tolist() == [
+        [0, 1, 0],
+        [1, 0, 1],
+        [0, 1, 0]
+    ]
+    assert solver.diff_itineraries[1].tolist() == [[0, 0], [0, 0]]
+
+
+@pytest.mark.parametrize("use_case", [
+    "use_case_cp_4_zones_switch",
+    "use_case_straight_line_2t",
+    "use_case_empty_zone",
+])
+def test_solver_circuit(use_case, request):
+    """Test that the circuit formulation finds valid solutions
+    of the same cost as the precedence formulation
+    """
+    objectives = []
+    for sequencing in ("precedence", "circuit"):
+        solver = CpAgent("ortools")
+        solver.sequencing = sequencing
+        cp_solver, status = solver._solve_from_steps(
+            *request.getfixturevalue(use_case))
+        assert solver.status_map[status] == OptimisationStatus.OPTIMAL
+        assert check_solution_validity(build_solution(solver, cp_solver))
+        objectives.append(cp_solver.ObjectiveValue())
+
+    assert objectives[0] == objectives[1]
+
+
+def test_solver_unknown_sequencing(use_case_straight_line_2t):
+    """Test that an unknown formulation is rejected
+    """
+    solver = CpAgent("ortools")
+    solver.sequencing = "unknown"
+    with pytest.raises(ValueError):
+        solver._solve_from_steps(*use_case_straight_line_2t)
+
+
+def test_solver_enforce_order():
+    """Test that the order is only enforced between steps of consecutive
+    min arrival times, steps with the same min arrival time being free
+    """
+    solver = CpAgent("ortools")
+    solver.allow_change_order = False
+    steps = [
+        build_step(0, 0, 0, -1, 20, 30, 5, False),
+        build_step(1, 1, 0, -1, 0, 10, 5, False),
+        build_step(2, 2, 0, -1, 0, 10, 5, False),
+        build_step(3, 3, 0, -1, 10, 20, 5, False),
+    ]
+    solver.nb_zones = 1
+    solver.nb_trains = 4
+    solver.steps = StepTable.from_steps(steps)
+    model = solver._build_model()
+    nb_constraints = len(model.Proto().constraints)
+    solver._add_enforce_order_constraints(model)
+
+    # 2 steps at 0 before the step at 10, itself before the step at 20
+    assert len(model.Proto().constraints) - nb_constraints == 3
+
+    cp_solver, status = solver._solve_from_steps(1, 4, steps)
+    assert status == cp_model.OPTIMAL
+    t_in = cp_solver.Values(solver.t_in).tolist()
+    assert max(t_in[1], t_in[2]) < t_in[3] < t_in[0]
+
+
+@pytest.mark.parametrize("hint_mode", ["delayed", "previous", "greedy"])
+def test_solver_hints(hint_mode, use_case_delay_conv):
+    """Test that hinting the solver from the delayed schedule, from
+    the previous solution or from the greedy heuristic gives a valid
+    solution
+    """
+    solver = CpAgent("ortools")
+    solver.hint_mode = hint_mode
+    solver.repair_hint = True
+    for _ in range(2):
+        cp_solver, _ = solver._solve_from_steps(
+            use_case_delay_conv[0],
+            use_case_delay_conv[1],
+            use_case_delay_conv[2],
+        )
+        assert check_solution_validity(build_solution(solver, cp_solver))
+    assert solver.last_solution[0].tolist() == build_solution(
+        solver, cp_solver).t_in
+
+
+def test_solver_unknown_hint_mode(use_case_straight_line_2t):
+    """Test that an unknown hint mode is rejected
+    """
+    solver = CpAgent("ortools")
+    solver.hint_mode = "unknown"
+    with pytest.raises(ValueError):
+        solver._solve_from_steps(*use_case_straight_line_2t)
+
+
+def test_solver_parameters(use_case_delay_conv):
+    """Test that the solver parameters are set on the solver
+    """
+    solver = CpAgent("ortools")
+    solver.solver_parameters = {
+        "num_workers": 2,
+        "random_seed": 3,
+        "search_branching": "FIXED_SEARCH",
+    }
+    cp_solver, _ = solver._solve_from_steps(
+        use_case_delay_conv[0],
+        use_case_delay_conv[1],
+        use_case_delay_conv[2],
+    )
+    assert cp_solver.parameters.num_workers == 2
+    assert cp_solver.parameters.random_seed == 3
+    assert check_solution_validity(build_solution(solver, cp_solver))
+
+
+def test_solver_portfolio(use_case_straight_line_2t):
+    """Test that racing parameter sets returns the optimal solution
+    """
+    solver = CpAgent("ortools")
+    solver.save_history = True
+    solver.parameter_portfolio = [
+        {"num_workers": 1, "search_branching": "FIXED_SEARCH"},
+        {"num_workers": 1, "random_seed": 7},
+    ]
+    status, t_in, t_out = solver._solve_portfolio(
+        use_case_straight_line_2t[0],
+        use_case_straight_line_2t[1],
+        StepTable.from_steps(use_case_straight_line_2t[2]),
+    )
+    assert status == OptimisationStatus.OPTIMAL
+    assert solver.portfolio_winner in (0, 1)
+    # the history of the winning parameter set
+    assert solver.history[-1][1] == 10
+    assert t_in.tolist() == [0, 10, 10, 30]
+    assert t_out.tolist() == [10, 30, 30, 40]
+
+
+def test_solve_report(schedule_straight_line_2t):
+    """Test that each phase of a solve is reported
+    """
+    solver = CpAgent("ortools")
+    solver._solve(*schedule_straight_line_2t)
+
+    assert list(solver.solve_report["phases"]) == [
+        "steps_from_schedule",
+        "create_variables",
+        "create_constraints",
+        "create_objective",
+        "solve",
+        "schedule_from_solution",
+    ]
+    for phase in solver.solve_report["phases"].values():
+        assert phase["wall_time"] >= 0
+        assert phase["cpu_time"] >= 0
+    assert solver.solve_report["model"]["steps"] == 4
+    assert solver.solve_report["model"]["variables"] > 0
+    assert solver.solve_report["model"]["constraints"] > 0
+    assert solver.solve_report["solver"]["status"] == "OPTIMAL"
+    assert solver.solve_report["solver"]["objective"] == (
+        solver._objective_value(solver.last_solution[0]))
+
+
+@pytest.mark.parametrize("relative_gap_limit", [None, 1.])
+def test_solver_gap_limit(relative_gap_limit, use_case_delay_conv):
+    """Test that the gap limits are set on the solver and that the
+    achieved gap is reported with the status
+    """
+    solver = CpAgent("ortools")
+    solver.relative_gap_limit = relative_gap_limit
+    solver.absolute_gap_limit = 1e9 if relative_gap_limit else None
+    cp_solver, _ = solver._solve_from_steps(*use_case_delay_conv)
+
+    assert check_solution_validity(build_solution(solver, cp_solver))
+    if relative_gap_limit is None:
+        assert solver.status == OptimisationStatus.OPTIMAL
+        assert solver.gap == 0
+    else:
+        assert cp_solver.parameters.relative_gap_limit == relative_gap_limit
+        assert cp_solver.parameters.absolute_gap_limit == 1e9
+        assert 0 <= solver.gap <= relative_gap_limit
+        assert (solver.status == OptimisationStatus.OPTIMAL) == (
+            solver.gap == 0)
+
+
+@pytest.mark.parametrize("use_case", [
+    "use_case_cp_4_zones_switch",
+    "use_case_straight_line_2t",
+    "use_case_delay_conv",
+])
+def test_solver_tight_domains(use_case, request):
+    """Test that the tightened domains are included in the default ones
+    and keep the optimal solutions
+    """
+    objectives = []
+    for tight_domains in (False, True):
+        solver = CpAgent("ortools")
+        solver.tight_domains = tight_domains
+        cp_solver, status = solver._solve_from_steps(
+            *request.getfixturevalue(use_case))
+        assert solver.status_map[status] == OptimisationStatus.OPTIMAL
+        assert check_solution_validity(build_solution(solver, cp_solver))
+        assert (
+            "tighten_domains" in solver.solve_report["phases"]
+        ) == tight_domains
+        objectives.append(cp_solver.ObjectiveValue())
+
+    tight = solver._step_domains()
+    loose = solver._step_domains(tighten=False)
+    for lower_bound in (0, 2, 4):
+        assert (tight[lower_bound] >= loose[lower_bound]).all()
+        assert (tight[lower_bound + 1] <= loose[lower_bound + 1]).all()
+    assert (tight[1] < loose[1]).any()
+    assert objectives[0] == objectives[1]
+
+
+def test_solver_tight_domains_frozen_early():
+    """Test that the tightened domains keep the optimal solutions when
+    a step is frozen before its min arrival time
+    """
+    steps = [
+        build_step(0, "a", 0, -1, 10, 20, 10, False),
+        build_step(1, "b", 0, -1, 0, 10, 10, False),
+    ]
+    objectives = []
+    for tight_domains in (False, True):
+        solver = CpAgent("ortools")
+        solver.tight_domains = tight_domains
+        solver.fixed_times = (np.array([0]), np.array([0]), np.array([10]))
+        cp_solver, status = solver._solve_from_steps(1, 2, steps)
+        assert solver.status_map[status] == OptimisationStatus.OPTIMAL
+        objectives.append(cp_solver.ObjectiveValue())
+
+    assert objectives == [0, 0]
+
+
+@pytest.mark.parametrize("use_case", [
+    "use_case_cp_4_zones_switch",
+    "use_case_straight_line_2t",
+    "use_case_delay_conv",
+])
+def test_solver_lean_model(use_case, request):
+    """Test that the lean model has the variables of the default model
+    and the same optimal solutions
+    """
+    objectives, models = [], []
+    for lean_model in (False, True):
+        solver = CpAgent("ortools")
+        solver.lean_model = lean_model
+        solver.variable_names = not lean_model
+        cp_solver, status = solver._solve_from_steps(
+            *request.getfixturevalue(use_case))
+        assert solver.status_map[status] == OptimisationStatus.OPTIMAL
+        assert check_solution_validity(build_solution(solver, cp_solver))
+        objectives.append(cp_solver.ObjectiveValue())
+        models.append(solver._build_model())
+
+    assert objectives[0] == objectives[1]
+    default, lean = (model.Proto() for model in models)
+    assert len(lean.variables) == len(default.variables)
+    assert len(lean.constraints) <= len(default.constraints)
+    assert [list(variable.domain) for variable in lean.variables] == [
+        list(variable.domain) for variable in default.variables]
+    assert all(variable.name == "" for variable in lean.variables)
+
+
+def test_portfolio_time_limit():
+    """Test that the time limit of the parameter sets overrides the one
+    of the agent
+    """
+    assert _time_limit(None, 30) == 30
+    assert _time_limit({"num_workers": 1}, 30) == 30
+    assert _time_limit({"max_time_in_seconds": 60}, 30) == 60
+    assert _time_limit({"maxTimeInSeconds": 2.5}, 30) == 2.5
+
+
+def test_worker_parameters(monkeypatch):
+    """Test that the processes solving at the same time share the cores
+    unless the parameters set num_workers
+    """
+    monkeypatch.setattr("os.cpu_count", lambda: 8)
+    assert _worker_parameters(None, 2) == {"num_workers": 4}
+    assert _worker_parameters({"random_seed": 7}, 16) == {
+        "random_seed": 7, "num_workers": 1}
+    assert _worker_parameters({"num_workers": 2}, 2) == {"num_workers": 2}
+    assert _worker_parameters({"numWorkers": 2}, 2) == {"numWorkers": 2}
@@ -0,0 +1,37 @@
+from cpagent.step_table import StepTable
+
+
+def test_step_table_from_steps(use_case_delay_conv):
+    """Testing the conversion of a list of steps to a StepTable
+    and back
+    """
+    steps = use_case_delay_conv[2]
+    table = StepTable.from_steps(steps)
+
+    assert len(table) == len(steps)
+    assert table.zone.tolist() == [step["zone"] for step in steps]
+    assert table.prev.tolist() == [step["prev"] for step in steps]
+    assert table.to_steps() == steps
+    assert list(table) == steps
+    assert table[3] == steps[3]
+
+
+def test_step_table_train_labels():
+    """Testing that train labels are integer encoded
+    """
+    table = StepTable(
+        train=[0, 0, 1],
+        zone=[0, 1, 0],
+        prev=[-1, 0, -1],
+        next=[1, -1, -1],
+        min_t_in=[0, 10, 10],
+        min_t_out=[10, 20, 20],
+        min_duration=[10, 10, 10],
+        is_fixed=[False, True, False],
+        train_labels=["train0", "train1"]
+    )
+
+    assert [step["train"] for step in table] == ["train0", "train0", "train1"]
+    assert table[1]["is_fixed"] is True
+    assert table.steps_per_zone()[0].tolist() == [0, 2]
+    assert table.steps_per_zone()[1].tolist() == [1]
@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from cpagent.cp_agent import CpAgent
+from .test_asynchronous import line_schedules
+
+
+def test_solve_stream(schedule_straight_line_2t):
+    """Test that the solutions are streamed improving, the last one
+    being the solution of a synchronous solve
+    """
+    ref_schedule, delayed_schedule, fixed_steps, weights = (
+        schedule_straight_line_2t)
+    agent = CpAgent("stream_agent")
+    solutions = list(agent.solve_stream(
+        ref_schedule, delayed_schedule, fixed_steps, weights,
+        materialize=True))
+
+    sync_agent = CpAgent("sync_agent")
+    regulated = sync_agent._solve(
+        ref_schedule, delayed_schedule, fixed_steps, weights)
+    objectives = [solution.objective for solution in solutions]
+    assert objectives == sorted(objectives, reverse=True)
+    assert solutions[-1].t_in.tolist() == sync_agent.last_solution[0].tolist()
+    assert solutions[-1].schedule.df.equals(regulated.df)
+    assert agent.status is None
+
+
+@pytest.mark.parametrize("settings", [
+    {"engine": "greedy"},
+    {"rolling_horizon": True, "window_length": 20, "window_overlap": 10},
+])
+def test_solve_stream_final(settings, schedule_straight_line_2t):
+    """Test that an engine without intermediate solutions streams its
+    final solution
+    """
+    agent = CpAgent("stream_agent")
+    sync_agent = CpAgent("sync_agent")
+    for name, value in settings.items():
+        setattr(agent, name, value)
+        setattr(sync_agent, name, value)
+    solution, = agent.solve_stream(*schedule_straight_line_2t)
+
+    sync_agent._solve(*schedule_straight_line_2t)
+    assert solution.best_bound is None
+    assert solution.t_in.tolist() == sync_agent.last_solution[0].tolist()
+    assert solution.objective == sync_agent._objective_value(
+        solution.t_in)
+    if settings.get("rolling_horizon"):
+        assert sync_agent.rolling_horizon_report["windows"] > 1
+
+
+def test_solution_callback(use_case_delay_conv):
+    """Test that the callback gets the solutions of the solve
+    """
+    solutions = []
+    agent = CpAgent("callback_agent")
+    agent.solution_callback = solutions.append
+    cp_solver, _ = agent._solve_from_steps(*use_case_delay_conv)
+
+    assert solutions[-1].objective == cp_solver.ObjectiveValue()
+    assert solutions[-1].t_out.tolist() == agent.last_solution[1].tolist()
+
+
+def test_solve_stream_close():
+    """Test that closing the stream stops the search
+    """
+    ref_schedule, delayed_schedule = line_schedules(40, 60, seed=8)
+    agent = CpAgent("stream_agent")
+    agent.tight_domains = False
+    agent.hint_mode = "greedy"
+    agent.max_optimization_time = 60
+
+    start = time.perf_counter()
+    stream = agent.solve_stream(ref_schedule, delayed_schedule)
+    next(stream)
+    stream.close()
+    assert time.perf_counter() - start < 10
@@ -0,0 +1,73 @@
+import importlib.util
+import pathlib
+
+import pytest
+
+SCALING_PATH = (
+    pathlib.Path(__file__).parent.parent / "benchmarks" / "scaling.py")
+
+
+@pytest.fixture(scope="module")
+def scaling():
+    """Import the scaling benchmark script"""
+    spec = importlib.util.spec_from_file_location("scaling", SCALING_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _results(build_time, solve_time, deterministic_time, memory=0):
+    return {"instances": [{
+        "nb_zones": 10,
+        "nb_trains": 5,
+        "phases": {
+            "build_model": {
+                "wall_time": build_time, "peak_memory": memory},
+            "solve_from_steps": {
+                "wall_time": solve_time,
+                "deterministic_time": deterministic_time,
+                "peak_memory": memory,
+            },
+        },
+    }]}
+
+
+def test_compare_no_regression(scaling):
+    """Test that results close to the baseline pass
+    """
+    baseline = _results(1., 1., 1.)
+    assert scaling.compare(_results(1.2, 1.2, 1.2), baseline) == []
+
+
+def test_compare_regression(scaling):
+    """Test that a phase slower or bigger than the baseline beyond the
+    tolerance and the floors is reported
+    """
+    baseline = _results(1., 1., 1., 10 << 20)
+    regressions = scaling.compare(_results(2., 1., 2., 20 << 20), baseline)
+    assert len(regressions) == 4
+    assert any(
+        "build_model: wall_time" in regression for regression in regressions)
+    assert any(
+        "solve_from_steps: deterministic_time" in regression
+        for regression in regressions)
+
+
+def test_compare_floors(scaling):
+    """Test that small measures regressing by less than the absolute
+    floors pass
+    """
+    baseline = _results(.03, .03, .03, 1 << 10)
+    assert scaling.compare(_results(.12, .12, .12, 1 << 19), baseline) == []
+    assert len(scaling.compare(_results(.14, .03, .03), baseline)) == 1
+
+
+def test_compare_solve_on_deterministic_time(scaling):
+    """Test that a noisy solve wall time is ignored when the
+    deterministic time is measured
+    """
+    baseline = _results(1., 1., 1.)
+    assert scaling.compare(_results(1., 3., 1.), baseline) == []
+    del baseline["instances"][0]["phases"]["solve_from_steps"][
+        "deterministic_time"]
+    assert len(scaling.compare(_results(1., 3., 1.), baseline)) == 1